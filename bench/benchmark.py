@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+'''
+Benchmarks hdcli commands against the local mock HDTools server (bench/mock_server.py).
+For every command and population size it reports throughput (users/s), per-user latency
+percentiles, peak memory (max RSS) and the number of HTTP calls the mock server saw.
+
+Each (command, size) pair runs in a fresh subprocess so memory numbers don't bleed over.
+
+Usage:
+
+```
+./bench/benchmark.py --sizes 100,1000,10000 --workers 8 --latency 0.02
+./bench/benchmark.py --commands lockout,profile --sizes 100000 --json results.json
+```
+'''
+
+import os
+import sys
+import json
+import time
+import array
+import argparse
+import resource
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = ["abroad", "active", "department", "lastpass", "lockout", "login", "profile", "reset", "search", "supervisor"]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+def get_job(command: str):
+    """Maps a command to its per-user hdcli job"""
+    from functools import partial
+    import hdcli
+    from hdtools import profile
+    jobs = {
+        "abroad": hdcli.abroad_job,
+        "active": partial(hdcli.active_job, locked=True),
+        "department": hdcli.department_job,
+        "lastpass": hdcli.lastpass_job,
+        "lockout": hdcli.lockout_job,
+        "login": hdcli.login_job,
+        "profile": partial(hdcli.profile_job, fields=list(profile.FIELDS)),
+        "reset": hdcli.reset_job,
+        "search": hdcli.search_job,
+        "supervisor": hdcli.supervisor_job,
+    }
+    return jobs[command]
+
+def run_one(command: str, size: int, workers: int, cache: bool):
+    """Runs a single benchmark in this process, returns the measurements"""
+    sys.path.insert(0, ROOT)
+    from hdtools import client, batch
+
+    client.identity_cache.configure(enabled=cache)
+    # The mock IdP has no lockouts, benchmark the engine rather than the login cap
+    client.configure_limits(workers=workers, login_rate=0)
+    client.configure_pool(workers)
+    client.setup_session()
+    job = get_job(command)
+
+    latencies = array.array("d")
+    def timed(username, password):
+        start = time.perf_counter()
+        try:
+            return job(username, password)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    password = "correct" if command == "login" else None
+    credentials = ((f"user{i}", password) for i in range(size))
+    errors = 0
+    start = time.perf_counter()
+    for username, value in batch.iter_batch(timed, credentials, workers):
+        if isinstance(value, dict) and "error" in value:
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "command": command,
+        "users": size,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "throughput": round(size / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "errors": errors,
+    }
+
+def start_mock(args, population: int):
+    """Starts the mock server on a free port, returns (process, base url)"""
+    cmd = [sys.executable, os.path.join(ROOT, "bench", "mock_server.py"), "--port", "0",
+           "--users", str(population), "--latency", str(args.latency), "--jitter", str(args.jitter),
+           "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate)]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise Exception("Mock server failed to start")
+    return process, line.strip().rsplit(" ", 1)[-1]
+
+def mock_counts(base_url: str):
+    with urllib.request.urlopen(f"{base_url}/_mock/stats") as r:
+        return json.load(r)
+
+def format_table(results) -> str:
+    columns = ["command", "users", "seconds", "throughput", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "http_calls", "errors"]
+    rows = [columns] + [[str(result.get(column, "")) for column in columns] for result in results]
+    widths = [max(len(row[n]) for row in rows) for n in range(len(columns))]
+    return "\n".join("  ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hdcli commands against the mock HDTools server")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="Comma separated commands to benchmark")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma separated user counts (ex. 100,1000,10000,100000)")
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="Use the identity cache (default benchmarks cold lookups)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock server latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--json", metavar="FILE", help="Also write the results as JSON")
+    parser.add_argument("--run", nargs=2, metavar=("COMMAND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_one(args.run[0], int(args.run[1]), args.workers, args.cache)))
+        return
+
+    commands = [command.strip() for command in args.commands.split(",") if command.strip()]
+    sizes = [int(size) for size in args.sizes.split(",")]
+    unknown = set(commands) - set(COMMANDS)
+    if unknown:
+        parser.error(f"Unknown command(s): {', '.join(sorted(unknown))}")
+
+    mock, base_url = start_mock(args, max(sizes))
+    env = dict(os.environ,
+               HDTOOLS_BASE_URL=base_url,
+               HDTOOLS_LOGINCHECK_URL=f"{base_url}/logincheck",
+               HDTOOLS_IDP_URL=base_url,
+               HDTOOLS_COOKIE="mock=1",
+               BIG_IP_COOKIE="mock=1")
+    if args.cache:
+        env.setdefault("HDCLI_CACHE_DIR", os.path.join(ROOT, ".bench_cache"))
+
+    results = []
+    try:
+        for command in commands:
+            for size in sizes:
+                before = mock_counts(base_url)
+                cmd = [sys.executable, os.path.abspath(__file__), "--run", command, str(size), "--workers", str(args.workers)]
+                if args.cache:
+                    cmd.append("--cache")
+                out = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                after = mock_counts(base_url)
+                result["http_calls"] = sum(after.values()) - sum(before.values())
+                results.append(result)
+                print(f"{command} x {size}: {result['throughput']} users/s, p95 {result['p95_ms']}ms", file=sys.stderr)
+    finally:
+        mock.terminate()
+
+    print(format_table(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+
+'''
+Local stand-in for HDTools, implements the endpoints `hdtools.client` uses against a
+synthetic population so hdcli can be developed, tested and benchmarked offline.
+
+Users are named `{prefix}{N}` for N in [0, --users), each also has a secondary username
+`{prefix}{N}a` that resolves to the same identity. Attributes (lockouts, departments,
+abroad courses, health...) are derived from N so every run sees the same data.
+
+Usage:
+
+```
+./bench/mock_server.py --port 8080 --latency 0.02 --error-rate 0.01
+export HDTOOLS_BASE_URL=http://127.0.0.1:8080
+export HDTOOLS_LOGINCHECK_URL=http://127.0.0.1:8080/logincheck HDTOOLS_IDP_URL=http://127.0.0.1:8080
+./hdcli.py lockout user1 user2
+```
+
+Login attempts succeed when the password is `correct`.
+Group `mod{M}-{R}` (Groups/centralEnrollments) has every user N with N % M == R as a member, ex. `mod10-3`.
+API responses carry an ETag and answer If-None-Match with 304. `GET /_mock/toggle-lockout/{username}` flips a user's AD lockout (for watch).
+With `--backends N` new clients are pinned round robin to BIG-IP backends `mock1..N` (requests are
+counted per backend in `/_mock/backends`), `--slow-backend ID` adds `--slow-latency` to every API response of one.
+`--expire-after N` expires the session cookie used for the Nth API request: from then on requests with it are
+redirected to the IdP login, like an expired Shibboleth session (any other cookie value is a fresh session).
+'''
+
+import re
+import json
+import hashlib
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, unquote, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MODULES = [
+    ("identityHDStudent", "Identity"),
+    ("usernamesHDStudent", "Usernames"),
+    ("studentRecords", "Student Records"),
+    ("employeeRecords", "Employee Records"),
+    ("centralEnrollments", "Groups"),
+    ("courses", "Courses"),
+    ("eventLogNew", "Vault History"),
+]
+DEPARTMENTS = ["CCIT Customer Support Services", "Experiential Education", "Computing", "Athletics", "Libraries"]
+SUPERVISORS = ["Nunamaker,Troy D", "Price,Brian A", "Smith,Jane Q"]
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+BIG_IP_COOKIE = "BIGipServeridmweb.app.clemson.edu_pool"
+
+class Population:
+    """Deterministic synthetic users"""
+    def __init__(self, size: int, prefix="user", vault_entries=200):
+        self.size = size
+        self.prefix = prefix
+        self.vault_entries = vault_entries
+        self.pattern = re.compile(rf"^{re.escape(prefix)}(\d+)(a?)$", re.IGNORECASE)
+        # Users whose lockout was flipped through /_mock/toggle-lockout
+        self.toggled = set()
+
+    def lookup(self, query: str):
+        """Returns the user index for a username/secondary username, None if not in the population"""
+        match = self.pattern.match(query.strip())
+        if not match or int(match.group(1)) >= self.size:
+            return None
+        return int(match.group(1))
+
+    def index_of_zid(self, zid: str):
+        if not zid.startswith("z") or not zid[1:].isdigit() or int(zid[1:]) >= self.size:
+            return None
+        return int(zid[1:])
+
+    def username(self, i: int):
+        return f"{self.prefix}{i}"
+
+    def search(self, i: int):
+        username = self.username(i)
+        health = "health-bad" if i % 17 == 0 else "health-good"
+        return {
+            "zid": f"z{i}",
+            "firstName": ["Test"],
+            "lastName": [f"User{i}"],
+            "preferredName": [""],
+            "primaryUserName": [username],
+            "userNames": [username, f"{username}a"],
+            "userNamesHealth": {username: health, f"{username}a": health},
+            "affiliations": ["employee"] if i % 3 else ["student"],
+            "XID": [f"C{i:08d}"],
+            "CUID": [f"{i:09d}"],
+            "employeeId": [f"{i:07d}"] if i % 3 else [],
+        }
+
+    def usernames(self, i: int):
+        lockout = True if i % 11 == 0 else ("" if i % 2 else False)
+        if i in self.toggled:
+            lockout = not lockout
+        changed = EPOCH - timedelta(hours=i)
+        return {"items": [{
+            "data": {
+                "label": self.username(i),
+                "activeDirectoryLockout": lockout,
+                "passwordChangedTime": changed.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            },
+            "properties": {"fields": [
+                {"id": "label", "label": "Username"},
+                {"id": "activeDirectoryLockout", "label": "AD Lockout"},
+                {"id": "passwordChangedTime", "label": "Password Changed"},
+            ]},
+        }]}
+
+    def employee_records(self, i: int):
+        if i % 3 == 0:
+            return {"items": []}
+        records = []
+        for n in range(1 + i % 2):
+            records.append({
+                "data": {
+                    "objectId": "employeeRecords",
+                    "status": "A",
+                    "departmentName": DEPARTMENTS[(i + n) % len(DEPARTMENTS)],
+                    "supervisorName": SUPERVISORS[(i + n) % len(SUPERVISORS)],
+                },
+                "properties": {"fields": [
+                    {"id": "departmentName", "label": "Department"},
+                    {"id": "supervisorName", "label": "Supervisor"},
+                ]},
+            })
+        return {"items": records}
+
+    def courses(self, i: int):
+        data = {"CPSC 1010": "Computer Science I", "ENGL 1030": "Composition"}
+        if i % 13 == 0:
+            data["TSAP 1000"] = "Study Abroad"
+        return {"items": [{"data": data, "properties": {"fields": []}}]}
+
+    def group_members(self, group: str):
+        """Members of group mod{M}-{R} (users N with N % M == R), None if there is no such group"""
+        match = re.match(r"^mod(\d+)-(\d+)$", group)
+        if not match or int(match.group(1)) == 0:
+            return None
+        m, r = int(match.group(1)), int(match.group(2))
+        return {"items": [{
+            "data": {"zid": f"z{i}", "primaryUserName": [self.username(i)], "name": f"Test User{i}"},
+            "properties": {"fields": [{"id": "name", "label": "Name"}]},
+        } for i in range(r, self.size, m)]}
+
+    def identity(self, i: int):
+        data = self.search(i)
+        return {"items": [{
+            "data": {"firstName": data["firstName"][0], "lastName": data["lastName"][0], "zid": data["zid"]},
+            "properties": {"fields": [{"id": "firstName", "label": "First Name"}, {"id": "lastName", "label": "Last Name"}]},
+        }]}
+
+    def vault_history(self, i: int):
+        """Newest first, generated lazily so huge histories don't need to be held in memory"""
+        for n in range(self.vault_entries):
+            yield {
+                "datetime": (EPOCH - timedelta(days=n, minutes=i % 60)).strftime("%Y-%m-%d %H:%M:%S"),
+                "operation": "modify" if n % 4 else "passwordReset",
+                "name": self.username(i),
+                "reason": f"Synthetic event {n}",
+            }
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HDToolsMock/1.0"
+    # Headers and body are separate writes, without this Nagle + delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, body: bytes, status=200, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        if status == 200 and self.command == "GET":
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self.send_body(b"", 304, headers={"ETag": etag})
+            headers = {**(headers or {}), "ETag": etag}
+        self.send_body(body, status, headers=headers)
+
+    def send_json_stream(self, entries):
+        """Sends a JSON array in chunks (chunked transfer encoding) as it is generated"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        def chunk(data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        chunk(b"[")
+        for n, entry in enumerate(entries):
+            chunk((b"," if n else b"") + json.dumps(entry).encode())
+        chunk(b"]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def inject(self):
+        """Simulates latency and throttling/transient errors, returns True if an error was sent"""
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        backend = self.backend()
+        with server.lock:
+            server.backend_counts[str(backend)] += 1
+        if backend is not None and backend == server.slow_backend:
+            delay += server.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < server.throttle_rate:
+            self.send_json({"ErrorMessage": "Too Many Requests"}, 429, {"Retry-After": "1"})
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            self.send_body(b"<html>Service Unavailable</html>", random.choice([502, 503]), "text/html")
+            return True
+        return False
+
+    def backend(self):
+        """BIG-IP backend the request is pinned to, None if it has no persistence cookie"""
+        match = re.search(rf"{BIG_IP_COOKIE}=([^;\s]+)", self.headers.get("Cookie") or "")
+        return match.group(1) if match else None
+
+    def session_cookie(self):
+        """The request's cookie without the BIG-IP persistence cookie, identifies its (Shibboleth) session"""
+        return ";".join(part.strip() for part in (self.headers.get("Cookie") or "").split(";")
+                        if part.strip() and not part.strip().startswith(BIG_IP_COOKIE))
+
+    def expired(self):
+        """Redirects to the IdP login if the request's session expired (see --expire-after), returns True if it did"""
+        server = self.server
+        cookie = self.session_cookie()
+        with server.lock:
+            server.api_requests += 1
+            if server.api_requests == server.expire_after:
+                server.expired.add(cookie)
+            expired = cookie in server.expired
+        if expired:
+            self.send_body(b"", 302, "text/html", {"Location": "/idp/profile/SAML2/Redirect/SSO?execution=e1s1"})
+        return expired
+
+    def endpoint(self, path: str):
+        """Endpoint name used for request counting, with ids stripped"""
+        parts = path.strip("/").split("/")
+        if path.startswith("/srv/feed/dynamic/rest/") and len(parts) > 4:
+            return "rest/" + parts[4] + ("/post" if self.command == "POST" else "")
+        if path.startswith("/srv/feed/dynamic/checkAuth/"):
+            return "checkAuth"
+        return path
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        server = self.server
+        with server.lock:
+            server.counts[self.endpoint(path)] += 1
+
+        if path == "/_mock/stats":
+            return self.send_json(dict(server.counts))
+        if path == "/_mock/backends":
+            return self.send_json(dict(server.backend_counts))
+        if path.startswith("/_mock/toggle-lockout/"):
+            i = server.population.lookup(path.rsplit("/", 1)[-1])
+            if i is None:
+                return self.send_json({"ErrorMessage": "Unknown user"}, 404)
+            with server.lock:
+                server.population.toggled ^= {i}
+            return self.send_json({"toggled": server.population.username(i)})
+        if path.startswith("/idp/profile/"):
+            return self.send_body(b"<html>Clemson Login</html>", content_type="text/html")
+        if path == "/" and self.session_cookie() in server.expired:
+            return self.send_body(b"", 302, "text/html", {"Location": "/idp/profile/SAML2/Redirect/SSO?execution=e1s1"})
+        if path == "/":
+            # Like the BIG-IP front end, pin clients that don't send a persistence cookie yet
+            headers = {}
+            if self.backend() is None:
+                with server.lock:
+                    backend_id = server.backend_ids[server.assigned % len(server.backend_ids)]
+                    server.assigned += 1
+                headers["Set-Cookie"] = f"{BIG_IP_COOKIE}={backend_id}; path=/"
+            return self.send_body(b"<html>HDTools</html>", content_type="text/html", headers=headers)
+        if path == "/logincheck":
+            return self.send_body(b"<html>Login</html>", content_type="text/html")
+        if path.startswith("/duosecurity.com"):
+            return self.send_body(b"<html>Duo</html>", content_type="text/html")
+        if self.expired() or self.inject():
+            return
+
+        parts = path.strip("/").split("/")
+        if path == "/srv/util/getModules.php":
+            return self.send_json({"nav": [{"module": module, "label": label} for module, label in MODULES]})
+        if path.startswith("/srv/feed/dynamic/checkAuth/") and len(parts) == 6:
+            return self.send_body(b"true")
+        if not path.startswith("/srv/feed/dynamic/rest/") or len(parts) != 6:
+            return self.send_json({"ErrorMessage": "Not Found"}, 404)
+
+        population = server.population
+        module, key = parts[4], parts[5]
+        if module == "Search":
+            i = population.lookup(key)
+            return self.send_json([] if i is None else [population.search(i)])
+
+        if module == "centralEnrollments" and population.index_of_zid(key) is None:
+            members = population.group_members(key)
+            return self.send_json({"ErrorMessage": f"Unknown group {key}"} if members is None else members)
+
+        i = population.index_of_zid(key)
+        if i is None:
+            return self.send_json({"ErrorMessage": f"Unknown vaultzid {key}"}, 404)
+        if module == "NameByID":
+            return self.send_json([f"Test User{i}"])
+        if module == "eventLogNew":
+            if "extended" in parse_qs(url.query):
+                return self.send_json_stream(population.vault_history(i))
+            return self.send_json({"items": []})
+        handlers = {
+            "identityHDStudent": population.identity,
+            "usernamesHDStudent": population.usernames,
+            "employeeRecords": population.employee_records,
+            "courses": population.courses,
+        }
+        if module in handlers:
+            return self.send_json(handlers[module](i))
+        return self.send_json({"items": []})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with server.lock:
+            server.counts[self.endpoint(path)] += 1
+
+        if path.startswith("/idp/profile/SAML2/Redirect/SSO"):
+            fields = parse_qs(body.decode())
+            if fields.get("j_password", [""])[0] == "correct":
+                return self.send_body(b"", 302, "text/html", {"Location": "/duosecurity.com/frame"})
+            return self.send_body(b"<html>Login failed</html>", content_type="text/html")
+        if self.expired() or self.inject():
+            return
+
+        parts = path.strip("/").split("/")
+        if not path.startswith("/srv/feed/dynamic/rest/usernamesHDStudent/") or len(parts) != 7:
+            return self.send_json({"ErrorMessage": "Not Found"}, 404)
+        payload = json.loads(body or b"{}")
+        if "password" in payload:
+            return self.send_json({"SuccessMessage": f"Password reset.<br><br><b>Temp-{random.randrange(10**8):08d}</b>"})
+        return self.send_json({"SuccessMessage": "Updated"})
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog (5) drops connection bursts, making clients wait out a 1s SYN retransmit
+    request_queue_size = 128
+
+    def __init__(self, address, population, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, verbose=False,
+                 backend_id="mock1", backends=1, slow_backend=None, slow_latency=0.0, expire_after=None):
+        super().__init__(address, MockHandler)
+        self.expire_after = expire_after
+        self.expired = set()
+        self.api_requests = 0
+        # Several backends are numbered 1..N in place of the id's own number (mock1 -> mock1, mock2, ...)
+        self.backend_ids = [backend_id] if backends <= 1 else [re.sub(r"\d*$", str(n), backend_id, count=1) for n in range(1, backends + 1)]
+        self.assigned = 0
+        self.slow_backend = slow_backend
+        self.slow_latency = slow_latency
+        self.population = population
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.verbose = verbose
+        self.counts = Counter()
+        # Kept apart from counts, which benchmark.py sums into the HTTP calls made
+        self.backend_counts = Counter()
+        self.lock = threading.Lock()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock HDTools server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--users", type=int, default=100000, help="Population size")
+    parser.add_argument("--prefix", default="user", help="Username prefix")
+    parser.add_argument("--vault-entries", type=int, default=200, help="Vault history entries per user")
+    parser.add_argument("--latency", type=float, default=0.0, help="Base latency added to each API response (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests answered with 502/503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of API requests answered with 429")
+    parser.add_argument("--backend-id", default="mock1", help="Value of the BIG-IP persistence cookie this server hands out")
+    parser.add_argument("--backends", type=int, default=1, help="Number of BIG-IP backends, ids are --backend-id numbered 1..N")
+    parser.add_argument("--slow-backend", metavar="ID", help="BIG-IP backend id whose API responses get --slow-latency extra")
+    parser.add_argument("--slow-latency", type=float, default=0.2, help="Extra latency of the slow backend (seconds)")
+    parser.add_argument("--expire-after", type=int, metavar="N", help="Expire the session cookie used for the Nth API request")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    population = Population(args.users, args.prefix, args.vault_entries)
+    server = MockServer((args.host, args.port), population, args.latency, args.jitter,
+                        args.error_rate, args.throttle_rate, args.verbose, args.backend_id,
+                        args.backends, args.slow_backend, args.slow_latency, args.expire_after)
+    print(f"Mock HDTools listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
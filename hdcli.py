@@ -1,10 +1,23 @@
 #!/usr/bin/env python
+import os
 import argparse
 import sys
 import json
+import hashlib
+import time
 import logging
+import itertools
+import contextlib
+from functools import partial
 
-from hdtools import config, client, cli
+from hdtools import config, batch, profile, reset
+from hdtools.dedup import AliasIndex
+from hdtools.journal import Journal
+
+# Loaded on first use, so help/usage doesn't pay for importing requests
+client = config.lazy_import('hdtools.client')
+cli = config.lazy_import('hdtools.cli')
+daemon = config.lazy_import('hdtools.daemon')
 
 # TODO: Make getModule have a list of default args to make it easier to find endpoints
 # TODO: Handle people with multiple usernames better (check active/primary?)
@@ -18,185 +31,262 @@ def handle_abroad(args):
     """Used to determine if a user is currently studying/working abroad. Returns a dictionary of 
     users with a boolean value indicating if they are abroad (True) or local (False). A filter
     can be applied to only show abroad/local users."""
-    credentials = load_credentials(args)
-    results = {}
-    
-    for username, password in credentials:
-        try:
-            results[username] = client.get_abroad_status(username)
-        except Exception as e:
-            results[username] = {"error": str(e)}
-    
-    results = {username: 'Abroad' if status else 'Local' for username, status in results.items() if isinstance(status, bool)}
-
-    if args.filter != "all":
-        target = args.filter.lower()
-        results = {username: value for username, value in results.items()
-                   if (value == 'Abroad' and target == 'abroad') or 
-                      (value == 'Local' and target == 'local')}
-    
-    handle_output(results, args, formatter=format_generic)
+    run_command(args, abroad_job, format_generic,
+                transform=partial(label_results, labels=('Abroad', 'Local'), target=args.filter), by_identity=True)
 
+def abroad_job(username, password):
+    return username, client.get_abroad_status(username)
 
 def handle_active(args):
     """Used to determine if a user is currently active. Returns a dictionary of 
     users with a boolean value indicating if they are active (True) or inactive(False). A filter
     can be applied to only show inactive/active users."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
-        try:
-            user_status = client.get_user_status(username)
-            lockout_status = False
-            logging.debug(f"STATUS: lockout_status: {username}: {lockout_status}")
-            if args.locked:
-                data = client.get_user_data(username)
-                vaultzid, username = client.extract_id_and_username(data)
-                lockout_status = client.get_module('usernamesHDStudent', vaultzid)['items'][0]['data'].get('activeDirectoryLockout', '') # this is a mess, sorry, also sometimes its false, sometimes empty string bruh
-                if lockout_status == '':
-                    lockout_status = False
-                results[username] = lockout_status
-            if not user_status or lockout_status:
-                results[username] = False
-            else:
-                results[username] = user_status
-        except Exception as e:
-            if str(e) == '0':
-                results[username] = "Not Found"
-            else:
-                results[username] = {"error": str(e)}
-
-    results = {username: 'Active' if status else 'Inactive' for username, status in results.items() if isinstance(status, bool)}
-
-    if args.filter != "all":
-        target = args.filter.lower()
-        results = {username: value for username, value in results.items()
-                   if (value == 'Active' and target == 'active') or 
-                      (value == 'Inactive' and target == 'inactive')}
-    handle_output(results, args, formatter=format_generic)
+    run_command(args, partial(active_job, locked=args.locked), format_generic,
+                transform=partial(label_results, labels=('Active', 'Inactive'), target=args.filter), by_identity=args.locked)
+
+def active_job(username, password, locked=False):
+    try:
+        user_status = client.get_user_status(username)
+        lockout_status = False
+        logging.debug(f"STATUS: lockout_status: {username}: {lockout_status}")
+        if locked:
+            vaultzid, username = client.resolve_identity(username)
+            lockout_status = client.extract_lockout_status(client.get_module('usernamesHDStudent', vaultzid, projected=True))
+        if not user_status or lockout_status:
+            return username, False
+        return username, user_status
+    except Exception as e:
+        if str(e) == '0':
+            return username, "Not Found"
+        raise
+
+def handle_serve(args):
+    """Runs a daemon that keeps the session warm and runs commands sent by thin clients (hdcli.py on the same machine)."""
+    def execute(argv):
+        args = build_parser().parse_args(argv)
+        if args.command in ('cli', 'serve'):
+            raise SystemExit(f"'{args.command}' can't be run through the daemon")
+        run(args)
+    daemon.serve(args.socket or daemon.socket_path(), execute)
 
 def handle_department(args):
     """Used to get the department(s) for one or more users. Returns a dictionary of users
     with a list of their associated department names."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
-        try:
-            data = client.get_user_data(username)
-            vaultzid, username = client.extract_id_and_username(data)
-
-            module = client.get_module('employeeRecords', vaultzid)
-            items = module.get('items', [])
-            results[username] = []
+    run_command(args, department_job, format_department, by_identity=True)
 
-            for item in items:
-                data = item.get('data', {})
-                if data.get('objectId') == 'employeeRecords' and data.get('status') == 'A':
-                    results[username].append(data.get('departmentName'))
-        except Exception as e:
-            results[username] = {"error": str(e)}
-    handle_output(results, args, formatter=format_department)
+def department_job(username, password):
+    vaultzid, username = client.resolve_identity(username)
+    return username, client.extract_employee_field(client.get_module('employeeRecords', vaultzid, projected=True), 'departmentName')
 
 def handle_lastpass(args):
     """Used to get the last password change time for one or more users. Returns a dictionary of users
     with their last password change timestamp."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
-        try:
-            results[username] = client.get_last_password_change(username)
-        except Exception as e:
-            results[username] = {"error": str(e)}
-    handle_output(results, args, formatter=format_generic)
+    run_command(args, lastpass_job, format_generic, by_identity=True)
+
+def lastpass_job(username, password):
+    return username, client.get_last_password_change(username)
 
 def handle_lockout(args):
     """Used to determine if a user currently has an AD lockout. Returns a dictionary of
     users with a boolean value indicating if they are locked out (True) or not (False). A filter
     can be applied to only show locked/unlocked users."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
-        try:
-            data = client.get_user_data(username)
-            vaultzid, username = client.extract_id_and_username(data)
-            lockout_status = client.get_module('usernamesHDStudent', vaultzid)['items'][0]['data'].get('activeDirectoryLockout', '') # this is a mess, sorry, also sometimes its false, sometimes empty string bruh
-            if lockout_status == '':
-                lockout_status = False
-            results[username] = lockout_status
-        except Exception as e:
-            results[username] = {"error": str(e)}
-
-    results = {username: 'Locked' if status else 'Unlocked' for username, status in results.items() if isinstance(status, bool)}
+    run_command(args, lockout_job, format_generic,
+                transform=partial(label_results, labels=('Locked', 'Unlocked'), target=args.filter), by_identity=True)
 
-    if args.filter != "all":
-        target = args.filter.lower()
-        results = {username: value for username, value in results.items()
-                   if (value == 'Locked' and target == 'locked') or 
-                      (value == 'Unlocked' and target == 'unlocked')}
-    handle_output(results, args, formatter=format_generic)
+def lockout_job(username, password):
+    vaultzid, username = client.resolve_identity(username)
+    return username, client.extract_lockout_status(client.get_module('usernamesHDStudent', vaultzid, projected=True))
 
 def handle_login(args):
     """Attempts to login to one or more users. Returns a dictionary of users
     with the result of the login attempt.
-    Currently requires the use of an input file, as you cannot provide passwords on the command line by design."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
-        try:
-            results[username] = "Succeeded" if client.check_login(username, password) else "Failed"
-        except Exception as e:
-            results[username] = {"error": str(e)}
-    handle_output(results, args, formatter=format_generic)
+    Currently requires the use of an input file, as you cannot provide passwords on the command line by design.
+    Attempts run concurrently under the --login-rate cap, with --stream results are written in the order they finish."""
+    run_command(args, login_job, format_login, ordered=False)
+
+def login_job(username, password):
+    succeeded, seconds = client.check_login_timed(username, password)
+    return username, {"result": "Succeeded" if succeeded else "Failed", "ms": round(seconds * 1000, 1)}
+
+def handle_profile(args):
+    """Gets multiple attributes for one or more users, fetching each needed module only once per user.
+    Returns a dictionary of users with a dictionary of the requested fields."""
+    if args.plan:
+        if args.group:
+            logging.error("--plan can't count --group members without contacting HDTools")
+            sys.exit(1)
+        credentials = load_credentials(args)
+        usernames = list(dict.fromkeys(client.identity_key(username) for username, password in credentials))
+        # Only reads the cookie and the cache, a recently validated cookie isn't checked again by the real run
+        client.setup_session()
+        cookie_checks = 0 if client.auth_cached() else 2
+        print(format_plan(profile.plan_calls(args.fields, usernames), args.fields, cookie_checks))
+        return
+    run_command(args, partial(profile_job, fields=args.fields), format_profile, by_identity=True)
+
+def profile_job(username, password, fields=()):
+    return profile.fetch_profile(username, fields)
 
 def handle_reset(args):
     """Resets the password for one or more users. Returns a dictionary of users
     with the result of the password reset attempt."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
+    if args.bulk:
+        handle_bulk_reset(args)
+        return
+    run_command(args, reset_job, format_reset, by_identity=True)
+
+def reset_job(username, password):
+    return reset.reset_user(*client.resolve_identity(username))
+
+def handle_bulk_reset(args):
+    """Bulk reset for incident response. Lookups are pipelined ahead of the resets, results are streamed as they
+    complete with progress/ETA on stderr, and every outcome is journaled (a new reset-*.journal unless --journal/--resume)."""
+    with contextlib.ExitStack() as stack:
+        # Only a journal the user asked for keeps the temporary passwords, the default one records outcomes
+        journal_passwords = bool(args.journal or args.resume)
+        if not journal_passwords:
+            args.journal = f"reset-{time.strftime('%Y%m%d-%H%M%S')}.journal"
+            logging.info(f"Recording reset outcomes to {args.journal} (continue with --resume {args.journal})")
+        journal = open_journal(args, stack)
+        credentials = iter_credentials(args) if args.stream else load_credentials(args)
+        progress = batch.Progress(total=None if args.stream else len(credentials), label="reset")
+        results = reset.iter_bulk_reset(credentials, args.workers, args.lookup_workers, journal=journal,
+                                        journal_passwords=journal_passwords, on_alias=lambda username: progress.skip())
+        stream_output(progress.track(results, failed=reset.reset_failed), args, formatter=format_reset)
+
+def handle_snapshot(args):
+    """Saves the modules the batch commands use (or --modules) for one or more users into a local SQLite snapshot,
+    which other commands can then answer from with --offline SNAPSHOT."""
+    try:
+        client.use_snapshot(args.snapshot)
+    except Exception as e:
+        logging.error(f"Unable to open snapshot {args.snapshot}: {e}")
+        sys.exit(1)
+    try:
+        run_command(args, partial(snapshot_job, modules=args.modules), format_snapshot, by_identity=True)
+    finally:
+        client.close_snapshot()
+
+def snapshot_job(username, password, modules=()):
+    # Search is always saved, offline lookups resolve identities from it
+    vaultzid, username = client.extract_id_and_username(client.get_user_data(username))
+    result = {"zid": vaultzid, "saved": [], "failed": {}}
+    for module in modules:
         try:
-            data = client.get_user_data(username)
-            vaultzid, username = client.extract_id_and_username(data)
-            reset_result = client.reset_password(username, vaultzid)
-            description_result = client.set_user_description(username, vaultzid)
-            results[username] = {
-                "SuccessMessage": reset_result.get("SuccessMessage"),
-                "description": description_result.get("description")
-            }
-            if not results[username]["SuccessMessage"]:
-                results[username]["error"] = "Password reset failed. No SuccessMessage returned."
+            client.get_module(module, vaultzid)
+            result["saved"].append(module)
         except Exception as e:
-            results[username] = {"error": str(e)}
-    handle_output(results, args, formatter=format_reset)
+            result["failed"][module] = str(e)
+    return username, result
+
+def parse_modules(value: str):
+    """Parses a comma separated module list, used as an argparse type"""
+    return list(dict.fromkeys(module.strip() for module in value.split(',') if module.strip()))
 
 def handle_search(args):
     """Searches for one or more users. Returns a dictionary of users
     with the result of the search."""
-    credentials = load_credentials(args)
-    results = {username: client.search_user(username) for username, password in credentials}
-    handle_output(results, args, formatter=format_search)
+    run_command(args, search_job, format_search)
+
+def search_job(username, password):
+    return username, client.search_user(username)
 
 def handle_supervisor(args):
     """Used to get the supervisor(s) for one or more users. Returns a dictionary of users
     with a list of their associated supervisor names."""
-    credentials = load_credentials(args)
-    results = {}
-    for username, password in credentials:
+    run_command(args, supervisor_job, format_supervisor, by_identity=True)
+
+def supervisor_job(username, password):
+    vaultzid, username = client.resolve_identity(username)
+    return username, client.extract_employee_field(client.get_module('employeeRecords', vaultzid, projected=True), 'supervisorName')
+
+def handle_vault(args):
+    """Pages through the vault history of one or more users, newest first. Entries are parsed and written as the
+    response downloads, so the full history is never held in memory. Output is always one line/object per entry."""
+    if args.page is not None and (args.page < 1 or args.page_size < 1):
+        logging.error("--page needs a page number and --page-size of at least 1")
+        sys.exit(1)
+    stream_output(iter_vault_entries(args), args, formatter=format_vault_entry)
+
+def iter_vault_entries(args):
+    """Yields (username, entry) for every requested vault history entry, pausing between pages on a terminal"""
+    start = (args.page - 1) * args.page_size if args.page else 0
+    limit = start + args.page_size if args.page else None
+    if args.limit is not None:
+        limit = min(limit, args.limit) if limit is not None else args.limit
+    pause = bool(args.page_size and not args.page and sys.stdin.isatty() and sys.stdout.isatty()
+                 and not any([args.output_normal, args.output_json, args.output_all]))
+
+    for username, password in iter_credentials(args):
         try:
-            data = client.get_user_data(username)
-            vaultzid, username = client.extract_id_and_username(data)
-
-            module = client.get_module('employeeRecords', vaultzid)
-            items = module.get('items', [])
-            results[username] = []
-
-            for item in items:
-                data = item.get('data', {})
-                if data.get('objectId') == 'employeeRecords' and data.get('status') == 'A':
-                    results[username].append(data.get('supervisorName'))      
+            vaultzid, username = client.resolve_identity(username)
+            with contextlib.closing(client.iter_vault_history(vaultzid, limit=limit, since=args.since)) as entries:
+                for n, entry in enumerate(itertools.islice(entries, start, None), start=1):
+                    yield username, entry
+                    if pause and n % args.page_size == 0:
+                        sys.stderr.write("-- more -- (Enter: next page, q: next user) ")
+                        sys.stderr.flush()
+                        if sys.stdin.readline().strip().lower() == "q":
+                            break
         except Exception as e:
-            results[username] = {"error": str(e)}
-    handle_output(results, args, formatter=format_supervisor)
+            yield username, {"error": str(e)}
+
+def handle_watch(args):
+    """Polls a command over a watchlist every --interval seconds and only outputs users whose value changed
+    (ex. user1: Unlocked -> Locked). Between polls GETs are sent as conditional requests, so unchanged users
+    cost a 304 instead of a full download. --state keeps the last values between runs (ex. from cron with --count 1)."""
+    job, labels = WATCH_COMMANDS[args.watch_command]
+    state = load_watch_state(args.state)
+    client.conditional.enabled = True
+    polls = 0
+    try:
+        while True:
+            client.memo.clear()
+            stream_output(iter_transitions(args, job, labels, state), args, formatter=format_transition)
+            polls += 1
+            if args.state:
+                save_watch_state(args.state, state)
+            if args.count and polls >= args.count:
+                break
+            time.sleep(args.interval)
+    finally:
+        client.conditional.enabled = False
+        client.conditional.clear()
+
+def iter_transitions(args, job, labels, state):
+    """Runs one poll, updating state and yielding (username, transition) for every user whose value changed"""
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
+    revalidated = client.conditional.revalidated
+    users = changed = 0
+    for username, value in batch.iter_batch(job, load_credentials(args), args.workers):
+        users += 1
+        if isinstance(value, dict) and "error" in value:
+            logging.warning(f"{username}: {value['error']}")
+            continue
+        if labels and isinstance(value, bool):
+            value = labels[0] if value else labels[1]
+        digest = hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()[:16]
+        previous = state.get(username)
+        state[username] = {"hash": digest, "value": value}
+        if previous is None and not args.initial:
+            continue
+        if previous is None or previous["hash"] != digest:
+            changed += 1
+            yield username, {"from": previous and previous["value"], "to": value, "at": now}
+    logging.debug(f"Watch poll: {users} users, {changed} changed, {client.conditional.revalidated - revalidated} responses not modified")
+
+def load_watch_state(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_watch_state(path, state):
+    """Writes atomically so an interrupted run never leaves a partial state file"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
 
 def extract_cred(x):
     y = x.split('\t')
@@ -207,18 +297,82 @@ def extract_cred(x):
     else:
         return ('', None)
 
-def load_credentials(args):
-    """Loads credentials from input file and/or CLI, normalizes with parse_username"""
-    credentials = list(map(lambda x: (x, None), args.usernames)) if args.usernames else [("", "")]
+def iter_group_credentials(groups):
+    """Yields (username, None) for every member of the --group groups, their identities are already resolved"""
+    for group in groups:
+        count = 0
+        try:
+            for vaultzid, username in client.iter_group_members(group):
+                count += 1
+                yield username, None
+        except Exception as e:
+            logging.error(e)
+            sys.exit(1)
+        logging.debug(f"Group {group}: {count} members")
+
+def iter_credentials(args):
+    """Lazily yields credentials from the CLI, the input file (line by line) and then --group members, normalized with parse_username"""
+    credentials = map(lambda x: (x, None), args.usernames or [])
 
-    if args.input:
-        with open(args.input) as f:
-            content = f.read()
-            # Split on spaces, newlines, and respecting quotes
-            file_credentials = list(map(extract_cred, content.split('\n')))
-            credentials.extend(file_credentials)
+    with contextlib.ExitStack() as stack:
+        if args.input:
+            f = stack.enter_context(open(args.input))
+            credentials = itertools.chain(credentials, map(extract_cred, (line.rstrip('\n') for line in f)))
+        if getattr(args, 'group', None):
+            credentials = itertools.chain(credentials, iter_group_credentials(args.group))
 
-    return [(client.parse_username(username), password) for username, password in credentials if username.strip()]
+        for username, password in credentials:
+            if username.strip():
+                yield client.parse_username(username), password
+
+def load_credentials(args):
+    """Loads credentials from input file and/or CLI, normalizes with parse_username"""
+    return list(iter_credentials(args))
+
+def label_results(results, labels, target="all"):
+    """Maps boolean results to (true, false) labels, dropping non boolean results and those not matching target"""
+    true_label, false_label = labels
+    for username, status in results:
+        if not isinstance(status, bool):
+            continue
+        value = true_label if status else false_label
+        if target == "all" or value.lower() == target.lower():
+            yield username, value
+
+def open_journal(args, stack, resolve=False):
+    """Opens the --journal/--resume journal (if any) on stack, exits if it can't be used.
+    With resolve jobs are journaled by vaultzid, so aliases of a completed user are skipped too."""
+    if not (args.journal or args.resume):
+        return None
+    try:
+        return stack.enter_context(Journal(args.resume or args.journal, args.command, resume=bool(args.resume), resolve=resolve))
+    except Exception as e:
+        logging.error(e)
+        sys.exit(1)
+
+def run_command(args, job, formatter, transform=None, by_identity=False, ordered=True):
+    """Runs job over every input user and outputs the results.
+    Aliases of the same user (case, email suffix, and with by_identity secondary usernames of the same vaultzid)
+    only run the job once and are reported once, under the first input's result.
+    With --stream input is read lazily and each result is written as soon as it (and, if ordered, those before it) completes.
+    With --journal/--resume every completed job is recorded, and jobs already in the journal are skipped."""
+    with contextlib.ExitStack() as stack:
+        journal = open_journal(args, stack, resolve=by_identity)
+        if journal:
+            job = journal.wrap(job)
+        aliases = AliasIndex(resolve=by_identity)
+        job = aliases.wrap(job)
+
+        credentials = iter_credentials(args) if args.stream else load_credentials(args)
+        results = aliases.filter(batch.iter_batch(job, credentials, args.workers, ordered=ordered or not args.stream))
+        if transform:
+            results = transform(results)
+
+        if args.stream:
+            stream_output(results, args, formatter=formatter)
+        else:
+            handle_output(dict(results), args, formatter=formatter)
+        logging.debug(f"Dedup: {aliases.inputs} inputs, {aliases.unique} unique")
 
 def handle_output(data, args, formatter=None):
     """Generic output handler for plain/JSON/all output modes."""
@@ -247,6 +401,38 @@ def handle_output(data, args, formatter=None):
         else:
             print(formatter(data) if formatter else str(data))
 
+def stream_output(results, args, formatter=None):
+    """Streaming version of handle_output, writes one line (plaintext) or one object (NDJSON) per result"""
+    output_flag_set = any([args.output_normal, args.output_json, args.output_all])
+    print_flag_set = any([args.print_normal, args.print_json])
+
+    with contextlib.ExitStack() as stack:
+        f_txt = f_json = None
+        if args.output_all:
+            f_txt = stack.enter_context(open(f"{args.output_all}.txt", "w"))
+            f_json = stack.enter_context(open(f"{args.output_all}.json", "w"))
+        elif args.output_normal:
+            f_txt = stack.enter_context(open(args.output_normal, "w"))
+        elif args.output_json:
+            f_json = stack.enter_context(open(args.output_json, "w"))
+
+        for username, value in results:
+            data = {username: value}
+            text = formatter(data) if formatter else str(data)
+            if f_txt:
+                f_txt.write(text + "\n")
+                f_txt.flush()
+            if f_json:
+                f_json.write(json.dumps(data) + "\n")
+                f_json.flush()
+
+            if not output_flag_set or print_flag_set:
+                if args.print_json:
+                    print(json.dumps(data), flush=True)
+                elif args.print_raw:
+                    print(str(data), flush=True)
+                else:
+                    print(text, flush=True)
 
 def format_generic(data: dict) -> str:
     """Formatter for generic output"""
@@ -262,17 +448,90 @@ def format_department(data: dict) -> str:
         lines.append(f"{name}:{dept_str}")
     return "\n".join(lines)
 
+def format_login(data: dict) -> str:
+    lines = []
+    for username, attempt in data.items():
+        if not isinstance(attempt, dict):
+            lines.append(f"{username}: {attempt}")
+        elif "error" in attempt:
+            lines.append(f"{username}: {attempt['error']}")
+        else:
+            lines.append(f"{username}: {attempt['result']} ({attempt['ms']:.0f} ms)")
+    return "\n".join(lines)
+
+def format_transition(data: dict) -> str:
+    def show(value):
+        if isinstance(value, list):
+            return ";".join(value) if value else "None"
+        return str(value)
+    lines = []
+    for username, transition in data.items():
+        if transition["from"] is None:
+            lines.append(f"[{transition['at']}] {username}: {show(transition['to'])}")
+        else:
+            lines.append(f"[{transition['at']}] {username}: {show(transition['from'])} -> {show(transition['to'])}")
+    return "\n".join(lines)
+
+def format_plan(plan: dict, fields, cookie_checks=2) -> str:
+    lines = [
+        f"Fields: {', '.join(fields)}",
+        f"Modules per user: {', '.join(plan['modules']) or 'None'}",
+        f"Users: {plan['users']}",
+        f"Search calls: {plan['search_calls']}",
+        f"Module calls: {plan['module_calls']}",
+        f"Total HTTP calls: {plan['total_calls']}" + (f" (+{cookie_checks} cookie checks)" if cookie_checks else ""),
+    ]
+    return "\n".join(lines)
+
+def format_profile(data: dict) -> str:
+    lines = []
+    for username, fields in data.items():
+        if "error" in fields and not isinstance(fields["error"], dict):
+            lines.append(f"{username}: {fields['error']}")
+            continue
+        entry = [username]
+        for field, value in fields.items():
+            if isinstance(value, dict):
+                value = f"error ({value.get('error')})"
+            elif isinstance(value, list):
+                value = ";".join(value) if value else "None"
+            entry.append(f"{field}: {value}")
+        lines.append(" | ".join(entry))
+    return "\n".join(lines)
+
 def format_reset(data: dict) -> str:
     lines = []
     for username, results in data.items():
-        if "SuccessMessage" in results:
+        if results.get("SuccessMessage"):
             # Better hope they never change the message lol
             reset_value = results["SuccessMessage"].split("<br><br><b>")[-1].split("</b>")[0]
-            lines.append(f"{username}: Password reset to '{reset_value}'")
+            warning = f" ({results['error']})" if "error" in results else ""
+            lines.append(f"{username}: Password reset to '{reset_value}'{warning}")
         else:
             lines.append(f"{username}: {results.get('error', 'Unknown error occurred')}")
     return "\n".join(lines)
 
+def format_vault_entry(data: dict) -> str:
+    lines = []
+    for username, entry in data.items():
+        if "error" in entry:
+            lines.append(f"{username}: {entry['error']}")
+        else:
+            lines.append(f"{username}: [{entry.get('datetime', 'N/A')}] {entry.get('operation', 'N/A')} {entry.get('name', 'N/A')} ({entry.get('reason', 'N/A')})")
+    return "\n".join(lines)
+
+def format_snapshot(data: dict) -> str:
+    lines = []
+    for username, result in data.items():
+        if "saved" not in result:
+            lines.append(f"{username}: {result.get('error')}")
+            continue
+        line = f"{username}: saved {len(result['saved'])}/{len(result['saved']) + len(result['failed'])} modules"
+        if result["failed"]:
+            line += " (" + "; ".join(f"{module}: {error}" for module, error in result["failed"].items()) + ")"
+        lines.append(line)
+    return "\n".join(lines)
+
 def format_search(data: dict) -> str:
     lines = []
     for username, results in data.items():
@@ -292,14 +551,42 @@ def format_supervisor(data: dict) -> str:
         lines.append(f"{name}:{sup_str}")
     return "\n".join(lines)
 
-def main():
-    """Entry point, sets up args and dispatch table."""
-    config.load_dotenv()
-
+def report_stats(args):
+    """Prints/exports the request statistics collected by the client during the run"""
+    if args.stats:
+        print(client.stats.format_summary(), file=sys.stderr)
+        if len(client.backends.backends) > 1:
+            for name, backend in client.backends.summary().items():
+                latency = f"{backend['latency_ms']}ms" if backend['latency_ms'] is not None else "n/a"
+                print(f"Backend {name}: {backend['requests']} requests, {backend['errors']} errors, "
+                      f"{backend['ejections']} ejections, latency {latency}", file=sys.stderr)
+    if args.stats_json:
+        client.stats.write_json(args.stats_json)
+    if args.stats_prom:
+        client.stats.write_prometheus(args.stats_prom, labels={"command": args.command})
+
+def build_parser():
+    """Builds the argument parser for all commands"""
     parser = argparse.ArgumentParser(description="HDTools Wrapper", add_help=False)
     parser.add_argument('-h', '--help', action='store_true', help="Show this help message and exit")
     parser.add_argument('-d', '--debug', action='store_true', help="Enable debug output")
+    parser.add_argument('--backends', type=int, default=1, metavar='N', help='Spread requests over sessions on N BIG-IP backend nodes (plus any in BIG_IP_COOKIES)')
     parser.add_argument('-i', '--input', metavar='FILE', help='Input file (ex. list of credentials)')
+    parser.add_argument('-g', '--group', action='append', metavar='GROUP', help='Also run over every member of a Groups (centralEnrollments) group, can be repeated')
+    parser.add_argument('--no-daemon', action='store_true', help='Run locally even if an hdcli daemon is running')
+    parser.add_argument('--no-cache', action='store_true', help='Disable persistent caches (username -> vaultzid identities, saved cookies, auth check)')
+    parser.add_argument('--offline', metavar='SNAPSHOT', help='Answer from a snapshot (see the snapshot command) instead of HDTools')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached identities and re-resolve them (results are still cached)')
+    parser.add_argument('--rate', type=float, metavar='RPS', help='Maximum HDTools requests per second (default unlimited)')
+    parser.add_argument('--retries', type=int, default=3, metavar='N', help='Retries for throttled (429) or transient (5xx) responses (default 3)')
+    journal_group = parser.add_mutually_exclusive_group()
+    journal_group.add_argument('--journal', metavar='FILE', help='Record each completed user to an append-only journal as the run progresses')
+    journal_group.add_argument('--resume', metavar='JOURNAL', help='Resume a journaled run, skipping users already completed in JOURNAL')
+    parser.add_argument('--stats', action='store_true', help='Print per-endpoint request statistics (to stderr) when done')
+    parser.add_argument('--stats-json', metavar='FILE', help='Write per-endpoint request statistics as JSON')
+    parser.add_argument('--stats-prom', metavar='FILE', help='Write per-endpoint request statistics as a Prometheus textfile')
+    parser.add_argument('-s', '--stream', action='store_true', help='Read input lazily and output each result as it completes (JSON output becomes NDJSON)')
+    parser.add_argument('-w', '--workers', type=int, default=batch.DEFAULT_WORKERS, metavar='N', help=f'Number of users to process concurrently (default {batch.DEFAULT_WORKERS})')
 
     print_group = parser.add_mutually_exclusive_group()
     print_group.add_argument('-pN', '--print_normal', action='store_true', help='Prints plaintext to the commandline (default)')
@@ -342,46 +629,177 @@ def main():
 
     # `login` command
     login_parser = command_subparser.add_parser('login', help='Attempt to login to one or more users')
+    login_parser.add_argument('--login-rate', type=float, metavar='RPS', help='Maximum login attempts per second (default 5, 0 = unlimited), keep it low to avoid tripping lockouts')
     login_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to attempt')
 
+    # `profile` command
+    profile_parser = command_subparser.add_parser('profile', help='Get multiple attributes for one or more users in a single pass')
+    profile_parser.add_argument('-F', '--fields', type=profile.parse_fields, default=list(profile.FIELDS), metavar='FIELDS', help=f"Comma separated fields to get (default: {','.join(profile.FIELDS)})")
+    profile_parser.add_argument('--plan', action='store_true', help='Show the HTTP calls the run would make and exit without sending any requests')
+    profile_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to check')
+
     # `reset` command
     reset_parser = command_subparser.add_parser('reset', help='Reset a password for one or more users')
+    reset_parser.add_argument('--bulk', action='store_true', help='Pipelined bulk mode: journaled, streamed output with progress/ETA on stderr')
+    reset_parser.add_argument('--lookup-workers', type=int, metavar='N', help='Concurrent identity lookups in bulk mode (default 2x --workers)')
     reset_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to reset')
 
     # `search` command
     search_parser = command_subparser.add_parser('search', help='Search for one or more users')
     search_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to search')
 
+    # `snapshot` command
+    default_modules = [module for module in profile.plan_modules(profile.FIELDS) if module != profile.SEARCH]
+    snapshot_parser = command_subparser.add_parser('snapshot', help='Save HDTools data for one or more users to a local snapshot for --offline queries')
+    snapshot_parser.add_argument('-M', '--modules', type=parse_modules, default=default_modules, metavar='MODULES', help=f"Comma separated modules to save besides Search (default: {','.join(default_modules)})")
+    snapshot_parser.add_argument('snapshot', metavar='SNAPSHOT', help='SQLite file to save to (added to/updated if it exists)')
+    snapshot_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to save')
+
     # `supervisor` command
     supervisor_parser = command_subparser.add_parser('supervisor', help='Get the supervisor(s) for one or more users')
     supervisor_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to check')
 
-    args = parser.parse_args()
-    config.init_logging(args.debug)
+    # `vault` command
+    vault_parser = command_subparser.add_parser('vault', help='Page through the vault history for one or more users')
+    vault_parser.add_argument('--limit', type=int, metavar='N', help='Only read the newest N entries per user')
+    vault_parser.add_argument('--since', metavar='DATE', help='Only read entries from DATE onwards (ex. 2025-01-31 or "2025-01-31 12:00:00")')
+    vault_parser.add_argument('--page-size', type=int, default=20, metavar='N', help='Entries per page (default 20, 0 disables paging)')
+    vault_parser.add_argument('--page', type=int, metavar='N', help='Only output page N (1 based) of each user\'s history')
+    vault_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to check')
+
+    # `watch` command
+    watch_parser = command_subparser.add_parser('watch', help='Poll a command over a watchlist and only output users whose value changed')
+    watch_parser.add_argument('watch_command', choices=['abroad', 'active', 'department', 'lastpass', 'lockout', 'supervisor'], metavar='COMMAND', help='Command to poll (abroad, active, department, lastpass, lockout, supervisor)')
+    watch_parser.add_argument('-n', '--interval', type=float, default=300, metavar='SECONDS', help='Seconds between polls (default 300)')
+    watch_parser.add_argument('-c', '--count', type=int, default=0, metavar='N', help='Stop after N polls (default 0, poll forever)')
+    watch_parser.add_argument('--state', metavar='FILE', help='Load/save the last seen values, so runs from cron only report changes since the previous run')
+    watch_parser.add_argument('--initial', action='store_true', help='Also output every user the first time they are seen')
+    watch_parser.add_argument('usernames', nargs='*', metavar='USERNAME', help='Username(s) to watch')
+
+    # `serve` command
+    serve_parser = command_subparser.add_parser('serve', help='Run a daemon that keeps the session warm and serves commands over a Unix socket')
+    serve_parser.add_argument('--socket', metavar='PATH', help='Socket path (default $HDCLI_SOCKET or ~/.cache/hdcli/hdcli.sock)')
+
+    return parser
+
+def run(args, parser=None):
+    """Sets up the client for args and dispatches the command"""
+    if args.command not in DISPATCH:
+        (parser or build_parser()).print_help()
+        return
 
-    dispatch = {
-        'cli': handle_cli,
-        'abroad': handle_abroad,
-        'active': handle_active,
-        'department': handle_department,
-        'lastpass': handle_lastpass,
-        'lockout': handle_lockout,
-        'login': handle_login,
-        'reset': handle_reset,
-        'search': handle_search,
-        'supervisor': handle_supervisor
-    }
-
-    if args.command in dispatch:
-        client.setup_session()
-        # Test cookie twice in same session to verify Authenticated w/ load balancer
-        if not (client.test_cookie() and client.test_cookie()):
-            logging.error("Failed to authenticate with HDTools. Is cookie set/valid?")
-            sys.exit(1)
-        print("Cookie: OK\n==========")
-        dispatch[args.command](args)
+    config.init_logging(args.debug)
+    client.identity_cache.configure(enabled=not args.no_cache, refresh=args.refresh)
+    client.persist_session = not args.no_cache
+    # Interactive sessions should always show fresh data, batch runs memoize GETs for the whole run
+    client.memo.enabled = args.command != 'cli'
+    client.memo.clear()
+    client.stats.reset()
+    client.configure_limits(rate=args.rate, workers=args.workers, retries=args.retries, login_rate=getattr(args, 'login_rate', None))
+    client.configure_pool(args.workers)
+    if getattr(args, 'plan', False):
+        # Dry runs never touch HDTools, not even to check the cookie
+        DISPATCH[args.command](args)
+        return
+    if args.offline:
+        run_offline(args)
+        return
+    client.setup_session()
+    if client.auth_cached():
+        logging.debug("Skipping cookie test, cookie was validated recently")
+    # Test cookie twice in same session to verify Authenticated w/ load balancer
+    elif client.test_cookie() and client.test_cookie():
+        client.cache_auth()
+        client.save_cookies()
     else:
-        parser.print_help()
+        logging.error("Failed to authenticate with HDTools. Is cookie set/valid?")
+        sys.exit(1)
+    if args.backends > 1 or os.environ.get("BIG_IP_COOKIES"):
+        count = client.setup_backends(args.backends)
+        logging.info(f"Spreading requests over {count} backend(s)")
+    print("Cookie: OK\n==========")
+    try:
+        DISPATCH[args.command](args)
+    except client.AuthExpired as e:
+        logging.error(f"{e}, stopping the run (with --journal, --resume continues where it stopped)")
+        sys.exit(1)
+    finally:
+        client.identity_cache.close()
+        client.save_cookies()
+        logging.debug(f"Connections: {client.connection_stats()}")
+        report_stats(args)
+
+# Commands watch can poll, with the (true, false) labels of boolean results
+WATCH_COMMANDS = {
+    'abroad': (abroad_job, ('Abroad', 'Local')),
+    'active': (active_job, ('Active', 'Inactive')),
+    'department': (department_job, None),
+    'lastpass': (lastpass_job, None),
+    'lockout': (lockout_job, ('Locked', 'Unlocked')),
+    'supervisor': (supervisor_job, None),
+}
+
+OFFLINE_COMMANDS = ('abroad', 'active', 'department', 'lastpass', 'lockout', 'profile', 'search', 'supervisor')
+
+def run_offline(args):
+    """Dispatches a read only command against a snapshot, no request is sent to HDTools"""
+    if args.command not in OFFLINE_COMMANDS:
+        logging.error(f"'{args.command}' can't run offline (offline commands: {', '.join(OFFLINE_COMMANDS)})")
+        sys.exit(1)
+    try:
+        snapshot = client.use_snapshot(args.offline, read=True)
+        count, oldest, newest = snapshot.info()
+    except Exception as e:
+        logging.error(f"Unable to open snapshot {args.offline}: {e}")
+        sys.exit(1)
+    # Identities must come from the snapshot too, not whatever the identity cache has seen since
+    client.identity_cache.configure(enabled=False)
+    if count:
+        logging.info(f"Offline: {count} responses fetched {time.strftime('%Y-%m-%d %H:%M', time.localtime(oldest))}"
+                     f" - {time.strftime('%Y-%m-%d %H:%M', time.localtime(newest))}")
+    try:
+        DISPATCH[args.command](args)
+    finally:
+        client.close_snapshot()
+        report_stats(args)
+
+DISPATCH = {
+    'cli': handle_cli,
+    'abroad': handle_abroad,
+    'active': handle_active,
+    'department': handle_department,
+    'lastpass': handle_lastpass,
+    'lockout': handle_lockout,
+    'login': handle_login,
+    'profile': handle_profile,
+    'reset': handle_reset,
+    'search': handle_search,
+    'serve': handle_serve,
+    'snapshot': handle_snapshot,
+    'supervisor': handle_supervisor,
+    'vault': handle_vault,
+    'watch': handle_watch
+}
+
+def main():
+    """Entry point, forwards to a running daemon if there is one, otherwise runs the command locally."""
+    config.load_dotenv()
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # The daemon returns output once the command ends: watch would tie it up until interrupted, and streamed
+    # (--stream, reset --bulk, vault) results/progress would be held back in memory instead of written as they
+    # complete (vault would also lose its paging)
+    streamed = args.stream or getattr(args, 'bulk', False)
+    if args.command in DISPATCH and args.command not in ('cli', 'serve', 'watch', 'vault') and not streamed and not args.no_daemon:
+        config.init_logging(args.debug)
+        response = daemon.forward(sys.argv[1:])
+        if response is not None:
+            sys.stdout.write(response["stdout"])
+            sys.stderr.write(response["stderr"])
+            sys.exit(response["code"])
+
+    run(args, parser)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,212 @@
+'''
+Asyncio HDTools client for scripts and services, covering the same operations as `hdtools.client`
+without its module level session, so one event loop can drive thousands of concurrent lookups.
+It depends on `aiohttp` (`pip install aiohttp`), which hdcli itself doesn't need.
+
+Requests share one keep-alive connection pool, at most `concurrency` are in flight at once and
+`rate` optionally caps requests per second. Throttled/transient responses are retried like the
+blocking client (jittered exponential backoff, honoring Retry-After).
+
+Usage:
+
+```
+import asyncio
+from hdtools.aio import AsyncClient
+
+async def main():
+    async with AsyncClient(concurrency=32) as hd:
+        zids = await asyncio.gather(*(hd.resolve_identity(user) for user in ["userA", "userB"]))
+
+asyncio.run(main())
+```
+'''
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+
+import aiohttp
+
+from hdtools import client
+from hdtools.projection import PROJECTIONS, ArrayDecoder, loads, project
+from hdtools.ratelimit import RETRY_STATUSES, backoff_delay, parse_retry_after
+
+class AsyncRateLimiter:
+    """Spaces requests at most rate per second (None or 0 = unlimited)"""
+    def __init__(self, rate=None):
+        self.rate = rate or None
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate is None:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + 1 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class AsyncClient:
+    """
+    Async HDTools client, use as `async with AsyncClient() as hd:`.
+    cookie defaults to the HDTOOLS_COOKIE/BIG_IP_COOKIE environment (same as hdcli), base_url to HDTOOLS_BASE_URL.
+    """
+    def __init__(self, cookie=None, base_url=None, concurrency=32, rate=None, retries=3, timeout=30):
+        self.cookie = cookie if cookie is not None else client.get_cookie()
+        self.base_url = (base_url or os.environ.get("HDTOOLS_BASE_URL") or client.BASE_URL).rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self._limiter = AsyncRateLimiter(rate)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._identities = {}
+        self._session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'Cookie': self.cookie,
+                    'User-Agent': "HDToolsClient/1.0",
+                    'Content-Type': "application/json",
+                    'Accept': 'application/json',
+                })
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, url: str, check=True, **kwargs):
+        """Sends a request under the concurrency/rate limits with retries, returns (status, body bytes)"""
+        retry_statuses = RETRY_STATUSES if method == 'GET' else client.POST_RETRY_STATUSES
+        attempt = 0
+        while True:
+            await self._limiter.acquire()
+            try:
+                async with self._semaphore:
+                    logging.debug(f"{method} {url}")
+                    async with self._session.request(method, url, **kwargs) as r:
+                        body = await r.read()
+                        status, retry_after = r.status, r.headers.get('Retry-After')
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if method != 'GET' or attempt >= self.retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logging.debug(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if status not in retry_statuses or attempt >= self.retries:
+                    if check and status >= 400:
+                        raise Exception(f"{method} {url} returned {status}")
+                    return status, body
+                delay = parse_retry_after(retry_after)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                logging.debug(f"{method} {url} returned {status}, retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _get_json(self, url: str, projection=None, check=True):
+        status, body = await self._request('GET', url, check=check)
+        data = loads(body)
+        return data if projection is None else project(data, PROJECTIONS[projection])
+
+    async def search_user(self, query: str):
+        """Searches for a user by username or name (query)"""
+        return await self._get_json(f"{self.base_url}/srv/feed/dynamic/rest/Search/{query}")
+
+    async def get_user_data(self, user: str):
+        """Gets a users' data from search by username, only the fields identity/status lookups use"""
+        username = client.parse_username(user)
+        data = await self._get_json(f"{self.base_url}/srv/feed/dynamic/rest/Search/{username}", 'Search', check=False)
+        if isinstance(data, dict) and 'ErrorMessage' in data:
+            raise Exception(f"Unable to get user {username}: {data['ErrorMessage']}")
+        elif not isinstance(data, list):
+            raise Exception(f"Unable to get user {username}: unknown data returned")
+        elif len(data) == 0:
+            raise Exception(f"Unable to get user {username}: no users returned")
+        return data[0]
+
+    async def resolve_identity(self, user: str) -> tuple[str, str]:
+        """Gets a users vaultzid and primary username, concurrent lookups of the same user share one search"""
+        key = client.identity_key(user)
+        if key not in self._identities:
+            self._identities[key] = asyncio.ensure_future(self.get_user_data(user))
+        try:
+            return client.extract_id_and_username(await self._identities[key])
+        except Exception:
+            # Don't remember failures, the next call searches again
+            self._identities.pop(key, None)
+            raise
+
+    async def get_module(self, module: str, vaultzid: str, projected=False):
+        """Gets a specified module, projected keeps only the fields the extractors use (see hdtools.projection)"""
+        url = f"{self.base_url}/srv/feed/dynamic/rest/{module}/{vaultzid}"
+        return await self._get_json(url, module if projected and module in PROJECTIONS else None)
+
+    async def get_vault_module(self, vaultzid: str, limit=None, since=None):
+        """Gets the vault history (newest first), with limit/since only the needed entries are downloaded and parsed"""
+        url = f"{self.base_url}/srv/feed/dynamic/rest/eventLogNew/{vaultzid}?extended=1"
+        entries = []
+        await self._limiter.acquire()
+        async with self._semaphore:
+            async with self._session.get(url) as r:
+                if r.status >= 400:
+                    raise Exception(f"GET {url} returned {r.status}")
+                parser = ArrayDecoder()
+                async for chunk in r.content.iter_chunked(16384):
+                    for entry in parser.feed(chunk):
+                        if since is not None and str(entry.get("datetime", "")) < since:
+                            return entries
+                        entries.append(entry)
+                        if limit is not None and len(entries) >= limit:
+                            return entries
+                    if parser.done:
+                        return entries
+                parser.close()
+        return entries
+
+    async def check_module_auth(self, module: str, vaultzid: str):
+        """Checks if the current user is authenticated for a specific module, None if unknown/failed"""
+        url = f"{self.base_url}/srv/feed/dynamic/checkAuth/{module}/{vaultzid}"
+        try:
+            status, body = await self._request('GET', url, check=False)
+            if status >= 400:
+                logging.debug(f"Failed auth check for module '{module}': {status}")
+                return None
+            return loads(body)
+        except (aiohttp.ClientError, ValueError) as e:
+            logging.debug(f"Failed auth check for module '{module}': {e}")
+            return None
+
+    async def get_name_by_id(self, vaultzid: str):
+        """Gets the full name (and username) by vaultzid"""
+        return await self._get_json(f"{self.base_url}/srv/feed/dynamic/rest/NameByID/{vaultzid}")
+
+    async def reset_password(self, username: str, vaultzid: str):
+        """Resets the user's password"""
+        url = f"{self.base_url}/srv/feed/dynamic/rest/usernamesHDStudent/{vaultzid}/username%23{username}"
+        status, body = await self._request('POST', url, json={"password": "password-api"})
+        return loads(body)
+
+    async def set_user_description(self, username: str, vaultzid: str):
+        """Sets the users description"""
+        url = f"{self.base_url}/srv/feed/dynamic/rest/usernamesHDStudent/{vaultzid}/username%23{username}"
+        payload = {
+            "description": [f"{datetime.now().strftime('%m/%d/%Y %H:%M')} - Password reset by CCIT Security"]
+        }
+        await self._request('POST', url, json=payload)
+        return payload
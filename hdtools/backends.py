@@ -0,0 +1,124 @@
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BIG_IP_PREFIX = "BIGipServer"
+
+class Backend:
+    """
+    One independently authenticated HDTools session. Its cookie (with its own BIG-IP persistence cookie) pins
+    it to one backend node, it has its own connection pool and tracks its health.
+    """
+    def __init__(self, name: str, session: requests.Session):
+        self.name = name
+        self.session = session
+        self.inflight = 0
+        self.latency = None
+        # Requests measured since the backend (re)joined the rotation
+        self.samples = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def configure_pool(self, size: int):
+        for prefix in ("https://", "http://"):
+            self.session.mount(prefix, HTTPAdapter(pool_connections=4, pool_maxsize=size, pool_block=True))
+
+    def healthy(self, now=None):
+        return self.ejected_until <= (now or time.monotonic())
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "healthy": self.healthy(),
+        }
+
+def big_ip_cookie(cookie: str):
+    """Gets the BIG-IP persistence cookie (name=value) from a cookie header, None if there isn't one"""
+    for part in cookie.split(";"):
+        if part.strip().startswith(BIG_IP_PREFIX):
+            return part.strip()
+    return None
+
+class BackendPool:
+    """
+    Balances requests over backends, each request goes to the healthy backend with the lowest
+    (in flight + 1) * latency (EWMA). Backends that fail max_failures requests in a row, or get slow_factor
+    times slower than the fastest other backend, are taken out of rotation for cooldown seconds.
+    The last healthy backend is never taken out.
+    """
+    def __init__(self, cooldown=30.0, max_failures=3, slow_factor=3.0, min_requests=10, alpha=0.2):
+        self.cooldown = cooldown
+        self.max_failures = max_failures
+        self.slow_factor = slow_factor
+        self.min_requests = min_requests
+        self.alpha = alpha
+        self.backends = []
+        self._lock = threading.Lock()
+
+    def set(self, backends):
+        with self._lock:
+            self.backends = list(backends)
+
+    def add(self, backend: Backend):
+        with self._lock:
+            self.backends.append(backend)
+
+    def acquire(self) -> Backend:
+        """Picks the backend for a request, call release when it completes"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b.healthy(now)]
+            if not candidates:
+                # Everything is out, use whichever comes back first
+                candidates = [min(self.backends, key=lambda b: b.ejected_until)]
+            backend = min(candidates, key=lambda b: (b.inflight + 1) * (b.latency or 0.001))
+            backend.inflight += 1
+            return backend
+
+    def release(self, backend: Backend, seconds: float, ok=True):
+        """Records a finished request (ok=False: connection error, throttled or 5xx) and ejects unhealthy backends"""
+        with self._lock:
+            backend.inflight -= 1
+            backend.requests += 1
+            backend.samples += 1
+            backend.latency = seconds if backend.latency is None else self.alpha * seconds + (1 - self.alpha) * backend.latency
+            if ok:
+                backend.failures = 0
+            else:
+                backend.errors += 1
+                backend.failures += 1
+            if backend not in self.backends:
+                # Replaced while the request was in flight (ex. sessions set up again with a refreshed cookie)
+                return
+            now = time.monotonic()
+            others = [b for b in self.backends if b is not backend and b.healthy(now)]
+            if not others or not backend.healthy(now):
+                return
+            if backend.failures >= self.max_failures:
+                self._eject(backend, now, f"{backend.failures} failed requests in a row")
+                return
+            fastest = min((b.latency for b in others if b.latency is not None and b.samples >= self.min_requests), default=None)
+            if fastest and backend.samples >= self.min_requests and backend.latency > self.slow_factor * fastest:
+                self._eject(backend, now, f"latency {backend.latency * 1000:.0f}ms vs {fastest * 1000:.0f}ms")
+
+    def _eject(self, backend: Backend, now: float, reason: str):
+        logging.warning(f"Taking backend {backend.name} out of rotation for {self.cooldown:.0f}s ({reason})")
+        backend.ejected_until = now + self.cooldown
+        backend.ejections += 1
+        # Comes back with a clean slate, its first requests measure it again
+        backend.failures = 0
+        backend.latency = None
+        backend.samples = 0
+
+    def summary(self):
+        with self._lock:
+            return {backend.name: backend.to_dict() for backend in self.backends}
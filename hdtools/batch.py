@@ -0,0 +1,140 @@
+import sys
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_WORKERS = 4
+
+class BatchAborted(Exception):
+    """Raised by a job to stop the whole batch (ex. the HDTools session expired) instead of failing only its user"""
+
+def run_job(job, username: str, password):
+    """Runs a single per-user job, isolating any error (except BatchAborted) into an {"error": ...} entry"""
+    try:
+        return job(username, password)
+    except BatchAborted:
+        raise
+    except Exception as e:
+        logging.debug(f"Job failed for {username}: {e}")
+        return username, {"error": str(e)}
+
+def iter_batch(job, credentials, workers=DEFAULT_WORKERS, ordered=True):
+    """
+    Runs job(username, password) -> (key, value) for each credential over a bounded thread pool.
+    Yields (key, value) tuples in input order as they complete (or in completion order if not ordered),
+    failed jobs become {"error": ...} values.
+    Credentials are consumed lazily, at most 2 * workers jobs are queued/in flight at once.
+    """
+    workers = max(1, workers)
+    logging.debug(f"Running jobs with {workers} workers")
+
+    if workers == 1:
+        for username, password in credentials:
+            yield run_job(job, username, password)
+        return
+
+    if not ordered:
+        yield from _iter_completed(job, credentials, workers)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for username, password in credentials:
+            pending.append(executor.submit(run_job, job, username, password))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _iter_completed(job, credentials, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for username, password in credentials:
+            pending.add(executor.submit(run_job, job, username, password))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class Progress:
+    """
+    Reports batch progress (done/total, failures, rate and ETA) on stderr as results are consumed.
+    On a terminal the status line is kept below the output, otherwise a line is written every interval seconds.
+    """
+    def __init__(self, total=None, label="progress", stream=None, interval=10.0):
+        self.total = total
+        self.label = label
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def status(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        line = f"[{self.label}] {self.done}"
+        if self.total:
+            line += f"/{self.total} ({self.done / self.total:.0%})"
+        line += f", {self.failed} failed, {rate:.1f}/s, elapsed {format_duration(elapsed)}"
+        if self.total and rate:
+            line += f", ETA {format_duration((self.total - self.done) / rate)}"
+        return line
+
+    def skip(self):
+        """Takes an input that won't produce a result (ex. a folded alias) off the total"""
+        if self.total:
+            self.total -= 1
+
+    def update(self, failed=False):
+        self.done += 1
+        self.failed += bool(failed)
+        now = time.monotonic()
+        if not self.tty and now - self._last >= self.interval:
+            self._last = now
+            self.stream.write(f"{self.status()}\n")
+            self.stream.flush()
+
+    def draw(self):
+        """Redraws the status line in place (terminal only)"""
+        if self.tty:
+            self.stream.write(f"\r\033[K{self.status()}")
+            self.stream.flush()
+
+    def clear(self):
+        if self.tty:
+            self.stream.write("\r\033[K")
+            self.stream.flush()
+
+    def finish(self):
+        self.clear()
+        self.stream.write(f"{self.status()}\n")
+        self.stream.flush()
+
+    def track(self, results, failed=lambda value: isinstance(value, dict) and "error" in value):
+        """Passes (key, value) results through, counting each one (failed(value) decides failures).
+        On a terminal the status line is cleared while the result is written and redrawn below it"""
+        try:
+            self.draw()
+            for key, value in results:
+                self.update(failed(value))
+                self.clear()
+                yield key, value
+                self.draw()
+        finally:
+            self.finish()
@@ -0,0 +1,97 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAXSIZE = 10000
+
+def cache_dir():
+    """Gets the directory used for persistent caches (HDCLI_CACHE_DIR or ~/.cache/hdcli)"""
+    path = os.environ.get("HDCLI_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "hdcli")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+class IdentityCache:
+    """
+    Two tier cache of username -> (vaultzid, primary username).
+    Lookups hit an in-memory LRU first, then an SQLite store on disk, entries older than ttl are ignored.
+    Identities seeded for the current run (ex. from a group's member list) are used even when the cache is disabled.
+    """
+    def __init__(self, path=None, ttl=DEFAULT_TTL, maxsize=DEFAULT_MAXSIZE):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.enabled = True
+        self.refresh = False
+        self._memory = OrderedDict()
+        self._seeded = {}
+        self._db = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, refresh=False, ttl=None):
+        """Enables/disables the cache, refresh skips reads but still stores new results"""
+        self.enabled = enabled
+        self.refresh = refresh
+        self._seeded.clear()
+        if ttl is not None:
+            self.ttl = ttl
+
+    def _connect(self):
+        if self._db is None:
+            path = self.path or os.path.join(cache_dir(), "identities.sqlite3")
+            logging.debug(f"Opening identity cache {path}")
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("CREATE TABLE IF NOT EXISTS identities (key TEXT PRIMARY KEY, zid TEXT, username TEXT, updated REAL)")
+        return self._db
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Returns (vaultzid, username) for key, or None if missing/expired"""
+        seeded = self._seeded.get(key)
+        if seeded is not None:
+            return seeded
+        if not self.enabled or self.refresh:
+            return None
+        with self._lock:
+            now = time.time()
+            value = self._memory.get(key)
+            if value is None:
+                row = self._connect().execute("SELECT zid, username, updated FROM identities WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value = row
+            zid, username, updated = value
+            if now - updated > self.ttl:
+                self._memory.pop(key, None)
+                return None
+            self._remember(key, value)
+            logging.debug(f"Identity cache hit: {key} -> {zid}, {username}")
+            return zid, username
+
+    def put(self, key: str, vaultzid: str, username: str):
+        """Stores an identity in both tiers"""
+        if not self.enabled:
+            return
+        with self._lock:
+            value = (vaultzid, username, time.time())
+            self._remember(key, value)
+            self._connect().execute("INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?)", (key, *value))
+
+    def seed(self, key: str, vaultzid: str, username: str):
+        """Remembers a freshly fetched identity for the rest of the run (and stores it like put)"""
+        self._seeded[key] = (vaultzid, username)
+        self.put(key, vaultzid, username)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -1,5 +1,75 @@
 from hdtools import client
+import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Modules prefetched in the background once an identity is selected, override with HDCLI_PREFETCH (comma separated, none disables)
+DEFAULT_PREFETCH = ["identityHDStudent", "usernamesHDStudent", "employeeRecords", "eventLogNew"]
+
+# Cached for the CLI session, the module list and module permissions practically never change
+_module_catalog = None
+_module_auth = {}
+
+def get_module_catalog():
+    """Gets the module navigation list, fetched once per CLI session"""
+    global _module_catalog
+    if _module_catalog is None:
+        _module_catalog = client.get_modules()["nav"]
+    return _module_catalog
+
+def check_module_auths(modules, zid):
+    """Checks auth for every module concurrently, results are cached per (module, zid)"""
+    missing = [m for m in modules if (m, zid) not in _module_auth]
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            for mod, authed in zip(missing, executor.map(lambda m: client.check_module_auth(m, zid), missing)):
+                _module_auth[(mod, zid)] = authed
+    return [_module_auth[(m, zid)] for m in modules]
+
+def prefetch_modules():
+    """Gets the list of modules to prefetch"""
+    value = os.environ.get("HDCLI_PREFETCH")
+    if value is None:
+        return DEFAULT_PREFETCH
+    # An empty value in .env is skipped by load_dotenv, so prefetching is turned off with an explicit none
+    if value.strip().lower() == "none":
+        return []
+    return [m.strip() for m in value.split(",") if m.strip()]
+
+def fetch_module(mod, zid):
+    """Fetches a module, the vault history uses its own endpoint"""
+    if mod == "eventLogNew":
+        # Only the newest entries are shown, don't download the rest
+        return client.get_vault_module(zid, limit=client.VAULT_PREVIEW)
+    return client.get_module(mod, zid)
+
+class Prefetcher:
+    """Speculatively fetches modules in the background while the module menu is displayed"""
+    _executor = None
+
+    def __init__(self, zid, modules):
+        if Prefetcher._executor is None:
+            Prefetcher._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+        self.zid = zid
+        self.futures = {mod: Prefetcher._executor.submit(fetch_module, mod, zid) for mod in modules}
+        logging.debug(f"Prefetching {', '.join(modules)} for {zid}")
+
+    def get(self, mod):
+        """Returns the prefetched module (waiting for it if still in flight), fetches it if it wasn't prefetched or failed"""
+        future = self.futures.get(mod)
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except Exception as e:
+                logging.debug(f"Prefetch of {mod} failed, refetching: {e}")
+                del self.futures[mod]
+        return fetch_module(mod, self.zid)
+
+    def cancel(self):
+        """Cancels prefetches that haven't started and drops the results (in flight requests finish in the background)"""
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
 
 def prompt_identity_choice(items):
     """Display a list and prompt for choice"""
@@ -74,14 +144,14 @@ def run():
                 else:
                     print(f"Full Name: {fullname}")
 
-                modules = client.get_modules()["nav"]
+                modules = get_module_catalog()
+                auths = check_module_auths([m["module"] for m in modules], zid)
                 print("\nAvailable Modules:")
                 indexed_modules = []
 
-                for idx, m in enumerate(modules, start=1):
+                for idx, (m, authed) in enumerate(zip(modules, auths), start=1):
                     mod = m["module"]
                     label = m["label"]
-                    authed = client.check_module_auth(mod, zid)
                     if authed is None:
                         status = "SK"
                     else:
@@ -89,35 +159,12 @@ def run():
                     print(f" {idx}. [{status}] {label} ({mod})")
                     indexed_modules.append((mod, label, status))
 
-                while True:
-                    print("\nType the number of the module you want to open (or press q to quit):")
-                    mod_choice = input("Module #: ").strip().lower()
-                    if mod_choice == "q":
-                        break
-                    if mod_choice == "":
-                        print("Skipping selection, defaulting to identity.")
-                        mod_choice = "1"
-                    if mod_choice.isdigit():
-                        idx = int(mod_choice) - 1
-                        if 0 <= idx < len(indexed_modules):
-                            if indexed_modules[idx][2] != "OK":
-                                print("Module is not available.")
-                                continue
-                            selected_mod, label, status = indexed_modules[idx]
-                            print(f"\nFetching module '{label}' ({selected_mod})...")
-                            if selected_mod == "eventLogNew":
-                                mod_json = client.get_vault_module(zid)
-                            else:
-                                mod_json = client.get_module(selected_mod, zid)
-                            print(f"\n=== {label} Module Info ===")
-
-                            if selected_mod == "eventLogNew":
-                                print(client.format_vault_history(mod_json))
-                            else:
-                                print(client.format_module(mod_json))
-                            print("-" * 40)
-                    else:
-                        print("Invalid selection. Please enter a valid number or press enter to skip.")
+                prefetcher = Prefetcher(zid, [mod for mod, label, status in indexed_modules
+                                              if status == "OK" and mod in prefetch_modules()])
+                try:
+                    select_modules(indexed_modules, prefetcher)
+                finally:
+                    prefetcher.cancel()
             else:
                 print(f"Unknown command: {line}")
 
@@ -127,3 +174,32 @@ def run():
         except Exception as e:
             print(f"Error: {e}")
             # logging.exception("Caught the following exception:")
+
+def select_modules(indexed_modules, prefetcher):
+    """Module selection menu for the selected identity"""
+    while True:
+        print("\nType the number of the module you want to open (or press q to quit):")
+        mod_choice = input("Module #: ").strip().lower()
+        if mod_choice == "q":
+            break
+        if mod_choice == "":
+            print("Skipping selection, defaulting to identity.")
+            mod_choice = "1"
+        if mod_choice.isdigit():
+            idx = int(mod_choice) - 1
+            if 0 <= idx < len(indexed_modules):
+                if indexed_modules[idx][2] != "OK":
+                    print("Module is not available.")
+                    continue
+                selected_mod, label, status = indexed_modules[idx]
+                print(f"\nFetching module '{label}' ({selected_mod})...")
+                mod_json = prefetcher.get(selected_mod)
+                print(f"\n=== {label} Module Info ===")
+
+                if selected_mod == "eventLogNew":
+                    print(client.format_vault_history(mod_json))
+                else:
+                    print(client.format_module(mod_json))
+                print("-" * 40)
+        else:
+            print("Invalid selection. Please enter a valid number or press enter to skip.")
@@ -1,22 +1,464 @@
 import os
+import re
+import json
+import time
+import hashlib
 import logging
+import threading
+import subprocess
 from datetime import datetime
+from urllib.parse import urlsplit
 
 import requests
+from requests.utils import quote
+
+from hdtools import config
+from hdtools.batch import BatchAborted
+from hdtools.cache import IdentityCache, cache_dir
+from hdtools.backends import Backend, BackendPool, BIG_IP_PREFIX, big_ip_cookie
+from hdtools.memo import RequestMemo, ConditionalCache
+from hdtools.snapshot import Snapshot
+from hdtools.projection import PROJECTIONS, decode, project, iter_json_array
+from hdtools.stats import RequestStats
+from hdtools.ratelimit import TokenBucket, AdaptiveLimiter, RETRY_STATUSES, backoff_delay, parse_retry_after
 
 BASE_URL = "https://hdtools.app.clemson.edu"
+LOGINCHECK_URL = "https://logincheck.app.clemson.edu"
+IDP_URL = "https://idp.app.clemson.edu"
 
 session = requests.Session()
+# Sessions (one per BIG-IP backend node) requests are spread over, session is the primary one
+backends = BackendPool()
+backends.set([Backend("primary", session)])
+identity_cache = IdentityCache()
+memo = RequestMemo()
+conditional = ConditionalCache()
+rate_limiter = TokenBucket()
+# Separate, strict (no burst) cap on IdP login attempts so credential checks can't trip lockouts
+DEFAULT_LOGIN_RATE = 5.0
+login_limiter = TokenBucket(DEFAULT_LOGIN_RATE, burst=1)
+concurrency = AdaptiveLimiter()
+max_retries = 3
+stats = RequestStats()
+persist_session = True
+AUTH_TTL = int(os.environ.get("HDCLI_AUTH_TTL") or 300)
+_session_key = None
+# Snapshot being written (snapshot command) or answering every request (--offline)
+recorder = None
+offline = None
+_pool_size = None
+VAULT_PREVIEW = 10
+
+# POSTs are not idempotent, only retry them when the server refused them outright
+POST_RETRY_STATUSES = {429, 503}
+
+# Session expiry handling: requests wait while the cookie is refreshed, generation counts refreshes
+refresh_auth = True
+auth_failed = False
+_auth_lock = threading.Lock()
+_auth_ready = threading.Event()
+_auth_ready.set()
+_auth_generation = 0
+
+class AuthExpired(BatchAborted):
+    """The HDTools session expired and couldn't be refreshed, stops the whole batch"""
+    def __init__(self, message="HDTools session expired and the cookie couldn't be refreshed (set HDCLI_REFRESH_COMMAND or update .env)"):
+        super().__init__(message)
+
+def configure_limits(rate=None, workers=4, retries=3, login_rate=None):
+    """Sets the requests per second cap, the maximum concurrent requests, the retry count and the
+    login attempts per second cap (None = DEFAULT_LOGIN_RATE, 0 = unlimited)"""
+    global max_retries
+    rate_limiter.configure(rate)
+    login_limiter.configure(DEFAULT_LOGIN_RATE if login_rate is None else login_rate, burst=1)
+    concurrency.configure(workers)
+    max_retries = retries
+
+def use_snapshot(path: str, read=False):
+    """Opens a snapshot, either recording successful GETs into it or (read) answering requests from it"""
+    global recorder, offline
+    store = Snapshot(path, readonly=read)
+    if read:
+        offline = store
+    else:
+        recorder = store
+    return store
+
+def close_snapshot():
+    global recorder, offline
+    for store in (recorder, offline):
+        if store is not None:
+            store.close()
+    recorder = offline = None
+
+def _offline_response(method: str, url: str):
+    """Answers a request from the --offline snapshot"""
+    if method != 'GET':
+        raise Exception(f"{method} requests are not available offline")
+    r = offline.get(url)
+    if r is None:
+        raise Exception(f"{url} is not in the snapshot")
+    stats.record_cache_hit(url)
+    return r
+
+def _send(s: requests.Session, method: str, url: str, **kwargs):
+    """Sends a request on session s, recording its latency/size/status in the request stats"""
+    start = time.monotonic()
+    try:
+        r = s.request(method, url, **kwargs)
+    except Exception:
+        stats.record(url, time.monotonic() - start)
+        raise
+    # Streamed bodies are read by the caller, only count what the server announced
+    nbytes = int(r.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(r.content)
+    stats.record(url, time.monotonic() - start, nbytes, r.status_code)
+    return r
+
+def _request(method: str, url: str, **kwargs):
+    """
+    Sends a request to HDTools under the rate limiter and adaptive concurrency limit.
+    Throttled (429) and transient (5xx) responses and connection errors are retried with jittered
+    exponential backoff, honoring Retry-After.
+    While the conditional cache is enabled GETs revalidate the last response instead of downloading it again.
+    """
+    if offline is not None:
+        return _offline_response(method, url)
+    revalidate = method == 'GET' and conditional.enabled and not kwargs.get('stream')
+    if revalidate:
+        kwargs['headers'] = {**kwargs.get('headers', {}), **conditional.headers(url)}
+    retry_statuses = RETRY_STATUSES if method == 'GET' else POST_RETRY_STATUSES
+    attempt = 0
+    reauthenticated = False
+    while True:
+        generation = _wait_for_auth()
+        rate_limiter.acquire()
+        concurrency.acquire()
+        backend = backends.acquire()
+        start = time.monotonic()
+        try:
+            r = _send(backend.session, method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            concurrency.release(time.monotonic() - start, ok=False)
+            backends.release(backend, time.monotonic() - start, ok=False)
+            if method != 'GET' or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logging.debug(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+        except Exception:
+            # Not retried (ex. TooManyRedirects, InvalidURL), but the slots must still be given back
+            concurrency.release(time.monotonic() - start, ok=False)
+            backends.release(backend, time.monotonic() - start, ok=False)
+            raise
+        else:
+            retry = r.status_code in retry_statuses
+            concurrency.release(time.monotonic() - start, ok=not retry)
+            backends.release(backend, time.monotonic() - start, ok=r.status_code < 500 and r.status_code != 429)
+            if session_expired(r, check_body=not kwargs.get('stream')):
+                # Nothing was done with an expired session (POSTs included), the request is sent again once refreshed
+                r.close()
+                if reauthenticated:
+                    raise AuthExpired(f"{method} {url} still redirects to the IdP after refreshing the cookie")
+                _reauthenticate(generation)
+                reauthenticated = True
+                continue
+            if not retry or attempt >= max_retries:
+                if revalidate:
+                    r = conditional.update(url, r)
+                if recorder is not None and method == 'GET' and r.status_code == 200 and not kwargs.get('stream'):
+                    recorder.put(url, r)
+                return r
+            r.close()
+            delay = parse_retry_after(r.headers.get('Retry-After'))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            logging.debug(f"{method} {url} returned {r.status_code}, retrying in {delay:.2f}s")
+        stats.record_retry(url)
+        attempt += 1
+        time.sleep(delay)
+
+def is_login_url(url: str):
+    """
+    True if url is the Shibboleth IdP login, where HDTools sends requests without a valid session: on the IdP host,
+    or a /idp/ or /Shibboleth.sso path. Only the host and path prefix are checked, never usernames in the path/query.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    idp_hosts = {"idp.app.clemson.edu"}
+    # An IDP_URL override on the same host as HDTools (ex. the mock server) is recognized by path only
+    if urlsplit(IDP_URL).hostname != urlsplit(BASE_URL).hostname:
+        idp_hosts.add((urlsplit(IDP_URL).hostname or "").lower())
+    path = parts.path.lower()
+    return host in idp_hosts or path.startswith("/idp/") or path.startswith("/shibboleth.sso")
+
+def session_expired(r: requests.Response, check_body=True):
+    """
+    True if HDTools answered with the IdP login instead of data: redirected there (the signals test_cookie uses),
+    or (check_body, not for streamed responses) an HTML page where an API returns JSON
+    """
+    if r.history or r.is_redirect:
+        targets = [h.headers.get('Location', '') for h in r.history] + [r.headers.get('Location', '')]
+        if r.history:
+            targets.append(r.url)
+        if any(is_login_url(url) for url in targets if url):
+            return True
+    if not check_body or r.status_code >= 300 or "/srv/feed/dynamic/rest/" not in r.url:
+        return False
+    return "text/html" in r.headers.get('Content-Type', '') and r.content.lstrip()[:1] == b"<"
+
+def _wait_for_auth():
+    """Holds new requests while the cookie is being refreshed, returns the auth generation they are sent under"""
+    _auth_ready.wait()
+    if auth_failed:
+        raise AuthExpired()
+    return _auth_generation
+
+def _reauthenticate(generation: int):
+    """
+    Called by a request that found the session expired. The first one pauses every other request and refreshes
+    the cookie, requests that were in flight at the time find it already refreshed and are just sent again.
+    Raises AuthExpired (stopping the batch) if the cookie can't be refreshed.
+    """
+    global auth_failed, _auth_generation
+    with _auth_lock:
+        if auth_failed:
+            raise AuthExpired()
+        if generation != _auth_generation:
+            return
+        _auth_ready.clear()
+        try:
+            logging.warning("HDTools session expired, pausing requests to refresh the cookie")
+            if not (refresh_auth and refresh_cookie()):
+                auth_failed = True
+                raise AuthExpired()
+            _auth_generation += 1
+            logging.warning("HDTools cookie refreshed, resuming")
+        finally:
+            _auth_ready.set()
+
+def refresh_cookie():
+    """
+    Gets a new HDTools cookie: the output of HDCLI_REFRESH_COMMAND if set (ex. util/get_hdtools_cookie.py),
+    otherwise whatever .env has now. Sets the session(s) up with it, returns True if it works.
+    """
+    command = os.environ.get("HDCLI_REFRESH_COMMAND")
+    if command:
+        logging.info(f"Running {command} for a new HDTools cookie")
+        try:
+            result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, text=True)
+        except OSError as e:
+            logging.error(f"Unable to run {command}: {e}")
+            return False
+        cookie = result.stdout.strip()
+        if result.returncode != 0 or not cookie:
+            logging.error(f"{command} failed (exit code {result.returncode})")
+            return False
+        os.environ["HDTOOLS_COOKIE"] = cookie
+    else:
+        config.load_dotenv(override=True)
+    count = len(backends.backends)
+    setup_session()
+    if not (test_cookie() and test_cookie()):
+        logging.error("The refreshed HDTools cookie doesn't work either")
+        return False
+    cache_auth()
+    if count > 1:
+        setup_backends(count)
+    return True
+
+def _get(url: str):
+    """GETs an HDTools API url through the per-run memo, duplicate/concurrent GETs for the same url share one request"""
+    sent = False
+    def request():
+        nonlocal sent
+        sent = True
+        return _request('GET', url)
+    r = memo.fetch(url, request)
+    if not sent:
+        stats.record_cache_hit(url)
+    return r
+
+def _get_json(url: str, projection=None, check=True):
+    """
+    GETs and decodes an HDTools API url once through the per-run memo. With a projection (a PROJECTIONS name)
+    only the fields hdcli uses are kept, the raw body and the rest of the payload are dropped right away.
+    """
+    key = url if projection is None else f"{url} [{projection}]"
+    sent = False
+    def request():
+        nonlocal sent
+        sent = True
+        r = _request('GET', url)
+        if check:
+            r.raise_for_status()
+        data = decode(r)
+        return data if projection is None else project(data, PROJECTIONS[projection])
+    data = memo.fetch(key, request)
+    if not sent:
+        stats.record_cache_hit(url)
+    return data
+
+def configure_pool(size: int):
+    """
+    Sizes each backend session's connection pool for size concurrent workers. Sessions are shared by all workers,
+    pool_block makes extra threads wait for a free keep-alive connection instead of opening throwaway ones.
+    """
+    global _pool_size
+    size = max(1, size)
+    if size == _pool_size:
+        return
+    _pool_size = size
+    for backend in backends.backends:
+        backend.configure_pool(size)
+    logging.debug(f"Connection pool size set to {size}")
+
+def connection_stats(s=None):
+    """
+    Counts requests sent and connections opened by a session's pools (default every backend session),
+    reused = requests that skipped a new connection
+    """
+    stats = {"requests": 0, "connections": 0}
+    sessions = [s] if s else [backend.session for backend in backends.backends]
+    for adapter in {adapter for s in sessions for adapter in s.adapters.values()}:
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    return stats
 
 def setup_session():
     """Sets the session headers, can be used for more in the future as needed"""
-    session.headers.update({
-        'Cookie': get_cookie(),
+    global BASE_URL, LOGINCHECK_URL, IDP_URL
+    # Overrides are meant for pointing hdcli at a test server (ex. bench/mock_server.py)
+    BASE_URL = os.environ.get("HDTOOLS_BASE_URL") or BASE_URL
+    LOGINCHECK_URL = os.environ.get("HDTOOLS_LOGINCHECK_URL") or LOGINCHECK_URL
+    IDP_URL = os.environ.get("HDTOOLS_IDP_URL") or IDP_URL
+    global _session_key, auth_failed
+    auth_failed = False
+    cookie = get_cookie()
+    _session_key = hashlib.sha256(cookie.encode()).hexdigest()
+    if persist_session:
+        cookie = merge_saved_cookies(cookie)
+    _set_headers(session, cookie)
+    backends.set([Backend(_backend_name(cookie, "primary"), session)])
+
+def _set_headers(s: requests.Session, cookie: str):
+    s.headers.update({
+        'Cookie': cookie,
         'User-Agent': "HDToolsClient/1.0",
         'Content-Type': "application/json",
         'Accept': 'application/json',
     })
 
+def _backend_name(cookie: str, default: str):
+    """Names a backend after the node its BIG-IP cookie pins it to"""
+    big_ip = big_ip_cookie(cookie)
+    return big_ip.split("=", 1)[-1] if big_ip else default
+
+def _new_backend(cookie: str):
+    s = requests.Session()
+    _set_headers(s, cookie)
+    backend = Backend(_backend_name(cookie, f"backend{len(backends.backends) + 1}"), s)
+    if _pool_size:
+        backend.configure_pool(_pool_size)
+    return backend
+
+def setup_backends(count=1):
+    """
+    Adds sessions pinned to other BIG-IP backend nodes so requests are spread over them (see hdtools.backends).
+    First the BIG-IP cookies listed in BIG_IP_COOKIES (comma separated name=value), then new sessions opened
+    without a BIG-IP cookie (the BIG-IP assigns each a node) until there are count distinct backends.
+    Backends that fail the cookie test are skipped. Returns the number of backends.
+    """
+    hdtools_cookie = ";".join(part.strip() for part in session.headers["Cookie"].split(";")
+                              if part.strip() and not part.strip().startswith(BIG_IP_PREFIX))
+    seen = {backend.name for backend in backends.backends}
+
+    def add(backend):
+        if backend.name in seen:
+            return
+        seen.add(backend.name)
+        if test_cookie(backend.session):
+            backends.add(backend)
+        else:
+            logging.warning(f"Skipping backend {backend.name}, its session failed the cookie test")
+
+    for big_ip in os.environ.get("BIG_IP_COOKIES", "").split(","):
+        if big_ip.strip():
+            add(_new_backend(f"{hdtools_cookie};{big_ip.strip()}"))
+
+    attempts = 0
+    while len(backends.backends) < count and attempts < 4 * count:
+        attempts += 1
+        s = requests.Session()
+        _set_headers(s, hdtools_cookie)
+        try:
+            s.get(BASE_URL, allow_redirects=True)
+        except requests.RequestException as e:
+            logging.warning(f"Unable to open another HDTools session: {e}")
+            break
+        big_ip = next((f"{c.name}={c.value}" for c in s.cookies if c.name.startswith(BIG_IP_PREFIX)), None)
+        s.close()
+        if big_ip is None:
+            logging.warning("HDTools didn't assign a BIG-IP backend, not spreading requests")
+            break
+        # An explicit Cookie header replaces the session's cookie jar, so the BIG-IP cookie goes in the header
+        add(_new_backend(f"{hdtools_cookie};{big_ip}"))
+    logging.debug(f"Backends: {', '.join(backend.name for backend in backends.backends)}")
+    return len(backends.backends)
+
+def _read_cache_file(name: str):
+    """Reads a JSON file from the cache dir, only if it belongs to the current HDTools cookie"""
+    try:
+        with open(os.path.join(cache_dir(), name)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get("session") == _session_key else None
+
+def _write_cache_file(name: str, data: dict):
+    path = os.path.join(cache_dir(), name)
+    tmp = f"{path}.tmp"
+    with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        json.dump({"session": _session_key, **data}, f)
+    os.replace(tmp, path)
+
+def merge_saved_cookies(cookie: str):
+    """
+    Appends cookies the server set on a previous run with the same HDTools cookie (ex. the BIG-IP persistence
+    cookie) to the cookie header, so the run lands on the same backend. Cookies already configured win.
+    """
+    data = _read_cache_file("cookies.json")
+    if not data:
+        return cookie
+    present = {part.split("=", 1)[0].strip() for part in cookie.split(";") if "=" in part}
+    now = time.time()
+    for saved in data.get("cookies", []):
+        if saved["name"] not in present and (not saved.get("expires") or saved["expires"] > now):
+            logging.debug(f"Using saved cookie {saved['name']}")
+            cookie += f";{saved['name']}={saved['value']}"
+    return cookie
+
+def save_cookies():
+    """Saves the cookies the server set this run (ex. BIG-IP persistence) for the next run"""
+    if not persist_session or _session_key is None:
+        return
+    cookies = [{"name": c.name, "value": c.value, "expires": c.expires} for c in session.cookies if not c.is_expired()]
+    if cookies:
+        _write_cache_file("cookies.json", {"cookies": cookies})
+
+def auth_cached():
+    """True if the current cookie passed the auth check within the last AUTH_TTL seconds"""
+    if not persist_session:
+        return False
+    data = _read_cache_file("auth.json")
+    return bool(data) and time.time() - data.get("checked", 0) < AUTH_TTL
+
+def cache_auth():
+    """Remembers a successful auth check for AUTH_TTL seconds"""
+    if persist_session:
+        _write_cache_file("auth.json", {"checked": time.time()})
+
 def get_cookie():
     """Gets the cookie from the envrionment variable or .env file"""
     cookie = ""
@@ -42,14 +484,14 @@ def get_cookie():
         logging.warning("Missing BigIP cookie in environment or .env")
     return cookie
 
-def test_cookie():
-    """Validates the cookie by attempting to login to HDTools"""
+def test_cookie(s=None):
+    """Validates the cookie (of session s, default the primary session) by attempting to login to HDTools"""
     url = f"{BASE_URL}"
     try:
         logging.debug(f"GET {url}")
-        r = session.get(url, allow_redirects=True)
+        r = _send(s or session, 'GET', url, allow_redirects=True)
         final_url = r.url.lower()
-        if "idp.app.clemson.edu" in final_url or "shib" in final_url:
+        if is_login_url(final_url):
             logging.debug(f"Redirected to {final_url}, cookie appears invalid.")
             return False
         return True
@@ -79,23 +521,22 @@ def get_modules():
     """
     url = f"{BASE_URL}/srv/util/getModules.php"
     logging.debug(f"GET {url}")
-    r = session.get(url)
-    logging.debug(f"Modules: {r.json()}")
-    r.raise_for_status()
-    return r.json()
+    modules = _get_json(url)
+    logging.debug(f"Modules: {modules}")
+    return modules
 
 def check_module_auth(module: str, vaultzid: str):
     """Checks if the current user is authenticated for a specific module. NOTE: Will likley not change much"""
     url = f"{BASE_URL}/srv/feed/dynamic/checkAuth/{module}/{vaultzid}"
     logging.debug(f"GET {url}")
     try:
-        r = session.get(url)
+        r = _get(url)
         if r.status_code == 404:
             logging.debug(f"Module '{module}' not found (404). Skipping.")
             return None
         r.raise_for_status()
-        return r.json() # Acts as bool, response is plaintext 'true'
-    except requests.RequestException as e:
+        return decode(r) # Acts as bool, response is plaintext 'true'
+    except (requests.RequestException, ValueError) as e:
         logging.debug(f"Failed auth check for module '{module}': {e}")
         return None
 
@@ -103,25 +544,46 @@ def get_name_by_id(vaultzid: str):
     """Gets the full name (and username) by vautzid"""
     url = f"{BASE_URL}/srv/feed/dynamic/rest/NameByID/{vaultzid}"
     logging.debug(f"GET {url}")
-    r = session.get(url)
-    r.raise_for_status()
-    return r.json()
+    return _get_json(url)
 
-def get_module(module: str, vaultzid: str):
-    """Gets a specified module"""
+def get_module(module: str, vaultzid: str, projected=False):
+    """Gets a specified module, projected keeps only the fields the extractors use (see hdtools.projection)"""
     url = f"{BASE_URL}/srv/feed/dynamic/rest/{module}/{vaultzid}"
     logging.debug(f"GET {url}")
-    r = session.get(url)
-    r.raise_for_status()
-    return r.json()
+    return _get_json(url, module if projected and module in PROJECTIONS else None)
 
-def get_vault_module(vaultzid: str):
-    """Gets the vault module specifically since it has a different response format"""
+def get_vault_module(vaultzid: str, limit=None, since=None):
+    """Gets the vault module specifically since it has a different response format.
+    With limit/since only the first limit entries (or those since the date) are downloaded and parsed, see iter_vault_history"""
+    if limit is not None or since is not None:
+        return list(iter_vault_history(vaultzid, limit=limit, since=since))
     url = f"{BASE_URL}/srv/feed/dynamic/rest/eventLogNew/{vaultzid}?extended=1"
     logging.debug(f"GET {url}")
-    r = session.get(url)
+    r = _get(url)
     r.raise_for_status()
-    return r.json()
+    return decode(r)
+
+def iter_vault_history(vaultzid: str, limit=None, since=None):
+    """
+    Streams the vault history (newest first), parsing entries incrementally as the response downloads.
+    Stops after limit entries or at the first entry older than since (a date/datetime string, ex. 2025-01-31),
+    closing the response so the rest of the body is never downloaded.
+    """
+    url = f"{BASE_URL}/srv/feed/dynamic/rest/eventLogNew/{vaultzid}?extended=1"
+    logging.debug(f"GET {url} (streaming)")
+    r = _request('GET', url, stream=True)
+    try:
+        r.raise_for_status()
+        if limit is not None and limit <= 0:
+            return
+        for n, entry in enumerate(iter_json_array(r.iter_content(chunk_size=16384)), start=1):
+            if since is not None and str(entry.get("datetime", "")) < since:
+                return
+            yield entry
+            if limit is not None and n >= limit:
+                return
+    finally:
+        r.close()
 
 def format_module(module_json):
     """Default formatter for modules, uses items and properties to display."""
@@ -144,14 +606,14 @@ def format_module(module_json):
     except Exception as e:
         return f"Failed to format module: {e}"
 
-def format_vault_history(data):
+def format_vault_history(data, limit=VAULT_PREVIEW):
     """Formatter for vault history, uses list of objects, different response from other modules"""
     try:
         if not data:
             return "No vault history found."
 
         lines = []
-        for entry in data[:10]:
+        for entry in data[:limit]:
             time = entry.get("datetime", "N/A")
             op = entry.get("operation", "N/A")
             name = entry.get("name", "N/A")
@@ -169,16 +631,11 @@ def search_user(query: str):
     """Searches for a user by username or name (query)"""
     url = f"{BASE_URL}/srv/feed/dynamic/rest/Search/{query}"
     logging.debug(f"GET {url}")
-    response = session.get(url)
-
-    response.raise_for_status()
-    logging.debug(f"Response status: {response.status_code}")
-    # logging.debug(f"Response data: {response.json()}")
-    return response.json()
+    return _get_json(url)
 
 def parse_username(username: str):
-    """Removes whitespace and clemson email from username"""
-    return username.strip().removesuffix('@clemson.edu').removesuffix('@g.clemson.edu')
+    """Removes whitespace and clemson email (any case) from username"""
+    return re.sub(r'@(g\.)?clemson\.edu$', '', username.strip(), flags=re.IGNORECASE)
 
 # Similar to search, but more script friendly
 def get_user_data(user: str):
@@ -186,9 +643,8 @@ def get_user_data(user: str):
     username = parse_username(user)
     url = f"{BASE_URL}/srv/feed/dynamic/rest/Search/{username}"
     logging.debug(f"GET {url}")
-    response = session.get(url)
-    data = response.json()
-    if isinstance(response, dict) and 'ErrorMessage' in data:
+    data = _get_json(url, 'Search', check=False)
+    if isinstance(data, dict) and 'ErrorMessage' in data:
         error = data['ErrorMessage']
         raise Exception(f"Unable to get user {username}: {error}")
     elif not isinstance(data, list):
@@ -211,39 +667,91 @@ def extract_id_and_username(user_json: dict) -> tuple[str, str]:
     logging.debug(f"Extracted username {primary_username} and id {vaultzid}")
     return vaultzid, primary_username[0]
 
+def identity_key(user: str):
+    """Normalized form of a username used as the identity cache key"""
+    return parse_username(user).lower()
+
+def resolve_identity(user: str) -> tuple[str, str]:
+    """Gets a users vaultzid and primary username, using the identity cache before searching"""
+    key = identity_key(user)
+    cached = identity_cache.get(key)
+    if cached is not None:
+        stats.record_cache_hit(f"{BASE_URL}/srv/feed/dynamic/rest/Search/{key}")
+        return cached
+    vaultzid, username = extract_id_and_username(get_user_data(user))
+    identity_cache.put(key, vaultzid, username)
+    return vaultzid, username
+
+def iter_group_members(group: str):
+    """
+    Yields (vaultzid, primary username) for every member of a Groups (centralEnrollments) group.
+    Members are seeded into the identity cache, so later lookups of them skip the search.
+    ASSUMES rest/centralEnrollments/{group} answers a group name with the members as module items whose data
+    carries zid and primaryUserName (like Search), elsewhere the module is only fetched by vaultzid.
+    """
+    url = f"{BASE_URL}/srv/feed/dynamic/rest/centralEnrollments/{quote(group, safe='')}"
+    logging.debug(f"GET {url}")
+    r = _request('GET', url)
+    r.raise_for_status()
+    try:
+        data = decode(r)
+    except ValueError:
+        raise Exception(f"Unable to get group {group}: response is not JSON")
+    if isinstance(data, dict) and 'ErrorMessage' in data:
+        raise Exception(f"Unable to get group {group}: {data['ErrorMessage']}")
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+        raise Exception(f"Unable to get group {group}: unknown data returned")
+    # Only the identities are kept, the rest of the payload can go while members are processed
+    members = [item.get("data", {}) for item in data["items"]]
+    del data
+    for member in members:
+        try:
+            vaultzid, username = extract_id_and_username(member)
+        except Exception as e:
+            logging.debug(f"Skipping member of {group} without an identity ({e}): {member}")
+            continue
+        identity_cache.seed(identity_key(username), vaultzid, username)
+        yield vaultzid, username
+
 def get_last_password_change(user: str):
     """Gets the time a users password was last changed"""
     logging.debug(f"Getting last password change for user: {user}")
-    data = get_user_data(user)
-    vaultzid, username = extract_id_and_username(data)
+    vaultzid, username = resolve_identity(user)
 
     if username is None:
         raise Exception(f"Username {username} not in data")
 
-    url = f"{BASE_URL}/srv/feed/dynamic/rest/usernamesHDStudent/{vaultzid}"
-    response = session.get(url)
-    data = response.json()
-
-    data = next((u for u in data['items'] if u['data']['label'].lower() == username.lower()), None)
-
-    reset_time = data['data']['passwordChangedTime']
-
-    return reset_time
+    return extract_password_change(get_module('usernamesHDStudent', vaultzid, projected=True), username)
 
 def get_user_status(user: str):
-    """Gets the users current status (health-good = active)"""
-    user_health = search_user(user)[0].get("userNamesHealth", {}) or {}
+    """Gets the users current status (health-good = active), from the same projected search get_user_data memoizes"""
+    url = f"{BASE_URL}/srv/feed/dynamic/rest/Search/{parse_username(user)}"
+    logging.debug(f"GET {url}")
+    return extract_user_status(_get_json(url, 'Search')[0], user)
+
+def get_abroad_status(user: str):
+    """Checks if the user is studying abroad (TSAP/SAP/CAP)"""
+    zid, username = resolve_identity(user)
+    return extract_abroad_status(get_module('courses', zid, projected=True))
+
+# Extractors, derive values from already fetched payloads so multiple fields can share one request
+def extract_password_change(module_json: dict, username: str):
+    """Extracts the last password change time for username from the usernamesHDStudent module"""
+    data = next((u for u in module_json['items'] if u['data']['label'].lower() == username.lower()), None)
+    return data['data']['passwordChangedTime']
+
+def extract_user_status(user_json: dict, user: str):
+    """Extracts the users status from search data (health-good = active)"""
+    user_health = user_json.get("userNamesHealth", {}) or {}
     user_health_lower = {k.lower(): v for k, v in user_health.items()}
     logging.debug(f"STATUS: user_health: {user}: {user_health_lower}")
     status = user_health_lower.get(user.lower(), None)
     logging.debug(f"STATUS: user_status: {user}: {status}")
     return (status == "health-good")
 
-def get_abroad_status(user: str):
-    """Checks if the user is studying abroad (TSAP/SAP/CAP)"""
-    zid, username = extract_id_and_username(search_user(user)[0])
-    module = get_module('courses', zid)
-    courses = module.get('items', [])[0].get('data', {})
+def extract_abroad_status(module_json: dict):
+    """Checks the courses module for abroad courses (TSAP/SAP/CAP)"""
+    courses = module_json.get('items', [])[0].get('data', {})
 
     abroad_courses = {'TSAP', 'CAP', 'SAP'}
 
@@ -252,13 +760,48 @@ def get_abroad_status(user: str):
             return True
     return False
 
+def extract_lockout_status(module_json: dict):
+    """Extracts the AD lockout flag from the usernamesHDStudent module"""
+    lockout_status = module_json['items'][0]['data'].get('activeDirectoryLockout', '') # this is a mess, sorry, also sometimes its false, sometimes empty string bruh
+    if lockout_status == '':
+        lockout_status = False
+    return lockout_status
+
+def extract_employee_field(module_json: dict, field: str):
+    """Extracts a field (ex. departmentName, supervisorName) from each active record in the employeeRecords module"""
+    values = []
+    for item in module_json.get('items', []):
+        data = item.get('data', {})
+        if data.get('objectId') == 'employeeRecords' and data.get('status') == 'A':
+            values.append(data.get(field))
+    return values
+
+_login_sessions = threading.local()
+
+def get_login_session():
+    """Gets this thread's IdP session, kept per thread so keep-alive connections are reused between login checks"""
+    if not hasattr(_login_sessions, "session"):
+        _login_sessions.session = requests.Session()
+    return _login_sessions.session
+
 def check_login(user: str, password: str):
     """Attempts to login using provided credentials"""
-    session = requests.Session()
-    session.get("https://logincheck.app.clemson.edu")
-    r = session.post("https://idp.app.clemson.edu/idp/profile/SAML2/Redirect/SSO?execution=e1s1", data={"j_username" : user, "j_password" : password, "_eventId_proceed" : ''})
+    return check_login_timed(user, password)[0]
+
+def check_login_timed(user: str, password: str):
+    """
+    Attempts to login using provided credentials, returns (succeeded, seconds the attempt took).
+    Attempts are capped at login_limiter per second across all threads, time spent waiting on the cap isn't counted.
+    """
+    login_limiter.acquire()
+    start = time.monotonic()
+    session = get_login_session()
+    # Every attempt needs a fresh IdP conversation, only the connections are reused
+    session.cookies.clear()
+    _send(session, 'GET', LOGINCHECK_URL)
+    r = _send(session, 'POST', f"{IDP_URL}/idp/profile/SAML2/Redirect/SSO?execution=e1s1", data={"j_username" : user, "j_password" : password, "_eventId_proceed" : ''})
 
-    return "duosecurity.com" in r.url
+    return "duosecurity.com" in r.url, time.monotonic() - start
 
 def reset_password(username: str, vaultzid: str):
     """Resets the user's/users' password(s)"""
@@ -267,9 +810,10 @@ def reset_password(username: str, vaultzid: str):
         "password":"password-api"
     }
     logging.debug(f"POST {url} with payload {payload}")
-    r = session.post(url, json=payload)
+    r = _request('POST', url, json=payload)
+    memo.invalidate(f"{BASE_URL}/srv/feed/dynamic/rest/usernamesHDStudent/{vaultzid}")
     r.raise_for_status()
-    return r.json()
+    return decode(r)
 
 def set_user_description(username: str, vaultzid: str):
     """Sets the users description"""
@@ -278,6 +822,7 @@ def set_user_description(username: str, vaultzid: str):
         "description": [f"{datetime.now().strftime("%m/%d/%Y %H:%M")} - Password reset by CCIT Security"]
     }
     logging.debug(f"POST {url} with payload {payload}")
-    r = session.post(url, json=payload)
+    r = _request('POST', url, json=payload)
+    memo.invalidate(f"{BASE_URL}/srv/feed/dynamic/rest/usernamesHDStudent/{vaultzid}")
     r.raise_for_status()
     return payload
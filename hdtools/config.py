@@ -1,8 +1,10 @@
 import os
+import sys
 import logging
+import importlib.util
 
-def load_dotenv(path=".env"):
-    """Loads key=value pairs from .env, doesn't override content already present in environment variables"""
+def load_dotenv(path=".env", override=False):
+    """Loads key=value pairs from .env, doesn't override content already present in environment variables unless override"""
     if not os.path.exists(path):
         return
     with open(path) as f:
@@ -12,7 +14,7 @@ def load_dotenv(path=".env"):
                 continue
             if '=' in line:
                 key, val = line.split('=', 1)
-                if not os.environ.get(key) and val != '':
+                if (override or not os.environ.get(key)) and val != '':
                     os.environ[key] = val.strip()
 
 def init_logging(debug=False):
@@ -21,3 +23,21 @@ def init_logging(debug=False):
         format='[%(levelname)s] %(message)s',
         level=level
     )
+    # basicConfig only applies once per process (ex. a daemon running many commands)
+    logging.getLogger().setLevel(level)
+
+def lazy_import(name: str):
+    """Imports a module that only actually loads on first attribute access, keeps startup fast for trivial invocations"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        # Lets `from package import child` find it without triggering the load
+        setattr(sys.modules[parent], child, module)
+    return module
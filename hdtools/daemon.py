@@ -0,0 +1,124 @@
+import io
+import os
+import json
+import signal
+import socket
+import logging
+import threading
+import contextlib
+import socketserver
+
+from hdtools.cache import cache_dir
+
+def socket_path():
+    """Gets the daemon's Unix socket path (HDCLI_SOCKET or hdcli.sock in the cache dir)"""
+    return os.environ.get("HDCLI_SOCKET") or os.path.join(cache_dir(), "hdcli.sock")
+
+def forward(argv, path=None):
+    """
+    Sends a command line to a running daemon and returns its response ({"code", "stdout", "stderr"}).
+    Returns None if no daemon is listening, once the request is sent any failure is raised instead of
+    returning None, so the caller never runs a command (ex. reset) a second time locally.
+    """
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            s.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            logging.debug(f"No daemon listening on {path}")
+            return None
+        s.sendall((json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n").encode())
+        with s.makefile("rb") as f:
+            line = f.readline()
+    finally:
+        s.close()
+    if not line:
+        raise Exception("Daemon closed the connection without responding")
+    return json.loads(line)
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            response = self.server.run(request["argv"], request.get("cwd"))
+        except (ValueError, KeyError) as e:
+            response = {"code": 2, "stdout": "", "stderr": f"Invalid request: {e}\n"}
+        self.wfile.write((json.dumps(response) + "\n").encode())
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves hdcli commands over a Unix socket, keeping the session, connection pools and caches warm between them.
+    Commands run one at a time (each still uses its own workers) since stdout/stderr and cwd are process wide.
+    """
+    daemon_threads = True
+
+    def __init__(self, path: str, execute):
+        self.path = path
+        self.execute = execute
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                raise Exception(f"A daemon is already listening on {path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(path)
+            finally:
+                probe.close()
+        # The socket grants the daemon's HDTools access, only the owner may connect
+        umask = os.umask(0o077)
+        try:
+            super().__init__(path, DaemonHandler)
+        finally:
+            os.umask(umask)
+
+    def run(self, argv, cwd=None):
+        """Runs a command line, capturing its output and exit code"""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        log_handler = logging.StreamHandler(stderr)
+        log_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+        code = 0
+        with self.lock:
+            previous = os.getcwd()
+            logging.getLogger().addHandler(log_handler)
+            try:
+                os.chdir(cwd or previous)
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                    self.execute(argv)
+            except SystemExit as e:
+                if isinstance(e.code, int) or e.code is None:
+                    code = e.code or 0
+                else:
+                    stderr.write(f"{e.code}\n")
+                    code = 1
+            except Exception:
+                logging.exception(f"Command failed: {argv}")
+                code = 1
+            finally:
+                logging.getLogger().removeHandler(log_handler)
+                os.chdir(previous)
+        return {"code": code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(path, execute):
+    """Runs the daemon until interrupted (Ctrl-C or SIGTERM), removing the socket on the way out"""
+    signal.signal(signal.SIGTERM, _terminate)
+    with DaemonServer(path, execute) as server:
+        logging.info(f"Serving hdcli on {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Stopping daemon")
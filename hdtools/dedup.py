@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from hdtools import config
+
+client = config.lazy_import('hdtools.client')
+
+DEFAULT_MAXSIZE = 100000
+
+class AliasIndex:
+    """
+    Folds every input alias of a person (case, @clemson.edu/@g.clemson.edu, secondary usernames) onto one job run.
+    The first input for an identity runs the job and is the only one reported, later (or concurrent) aliases are
+    dropped from the results (see filter).
+    With resolve, inputs are keyed by vaultzid (resolved through the identity cache), otherwise by normalized username.
+    Passwords are part of the key (login), so different passwords for the same user are still all tried.
+    Only the keys of the last maxsize identities are remembered, not their results, so memory stays flat on
+    streamed runs (an alias more than maxsize identities after its first input runs again).
+    on_alias(username) is called for every folded alias (ex. to take it off a progress total).
+    """
+    def __init__(self, resolve=False, maxsize=DEFAULT_MAXSIZE, on_alias=None):
+        self.resolve = resolve
+        self.maxsize = maxsize
+        self.on_alias = on_alias
+        self.inputs = 0
+        self.unique = 0
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, username: str, password=None):
+        """Identity key for an input, falls back to the normalized username if it can't be resolved"""
+        key = client.identity_key(username)
+        if self.resolve:
+            try:
+                key, _ = client.resolve_identity(username)
+            except Exception as e:
+                # The job will resolve (and fail) again on its own, reporting the error for this input
+                logging.debug(f"Dedup: unable to resolve {username}: {e}")
+        if password is None:
+            return key, None
+        # Keys show up in debug logs, never keep the password itself
+        return key, hashlib.sha256(password.encode()).hexdigest()[:16]
+
+    def wrap(self, job):
+        """Wraps job(username, password) -> (key, value) so each identity only runs once per batch,
+        folded aliases return None"""
+        def shared(username, password):
+            key = self.key(username, password)
+            with self._lock:
+                self.inputs += 1
+                if key in self._seen:
+                    self._seen.move_to_end(key)
+                    logging.debug(f"Dedup: {username} is an alias of an earlier input, skipping")
+                    folded = True
+                else:
+                    folded = False
+                    self._seen[key] = True
+                    self.unique += 1
+                    while len(self._seen) > self.maxsize:
+                        self._seen.popitem(last=False)
+            if folded:
+                if self.on_alias:
+                    self.on_alias(username)
+                return None
+            return job(username, password)
+        return shared
+
+    @staticmethod
+    def filter(results):
+        """Drops the folded aliases from wrapped job results"""
+        return (result for result in results if result is not None)
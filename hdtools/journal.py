@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from hdtools import config
+
+client = config.lazy_import('hdtools.client')
+
+class Journal:
+    """
+    Append-only NDJSON journal of completed jobs, written as a batch runs.
+    When resuming, jobs already completed in the journal are not run again, their recorded result is returned instead.
+    Jobs that raised are recorded but rerun on resume.
+    Jobs are identified by normalized username (identity_key), with resolve by vaultzid, so any alias of a
+    completed user is skipped on resume.
+    """
+    def __init__(self, path: str, command: str, resume=False, resolve=False):
+        self.path = path
+        self.command = command
+        self.resolve = resolve
+        self.done = {}
+        self._lock = threading.Lock()
+        if resume:
+            self._load()
+        elif os.path.exists(path) and os.path.getsize(path):
+            raise Exception(f"Journal {path} already exists, use --resume to continue it")
+        # Results can hold credentials (ex. temporary passwords of reset), only the owner may read the journal
+        self._file = open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600), "a")
+        if not os.path.getsize(path):
+            self._write({"command": command, "started": time.time()})
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logging.debug(f"Journal {self.path} does not exist yet, starting a new one")
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line may be partially written if the run was killed
+                    logging.debug(f"Skipping corrupt journal line: {line!r}")
+                    continue
+                if "command" in entry:
+                    if entry["command"] != self.command:
+                        raise Exception(f"Journal {self.path} is for '{entry['command']}', not '{self.command}'")
+                    continue
+                if entry.get("ok"):
+                    self.done[entry["id"]] = (entry["key"], entry["value"])
+                else:
+                    self.done.pop(entry["id"], None)
+        logging.debug(f"Resuming journal {self.path}, {len(self.done)} jobs already completed")
+
+    def job_id(self, username: str, password=None, vaultzid=None):
+        """
+        Identifies a job by the user's vaultzid (if given, or resolved with resolve) or normalized username,
+        passwords (login) are only stored hashed
+        """
+        if vaultzid is None and self.resolve:
+            try:
+                vaultzid, _ = client.resolve_identity(username)
+            except Exception as e:
+                # The job resolves (and fails) again on its own, it is journaled by username
+                logging.debug(f"Journal: unable to resolve {username}: {e}")
+        job_id = f"zid:{vaultzid}" if vaultzid is not None else client.identity_key(username)
+        if password is None:
+            return job_id
+        return f"{job_id}\t{hashlib.sha256(password.encode()).hexdigest()[:16]}"
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def lookup(self, username: str, password=None, vaultzid=None):
+        """Returns the recorded (key, value) of a completed job, or None if it still has to run"""
+        return self.done.get(self.job_id(username, password, vaultzid))
+
+    def record(self, username: str, password, key, value, ok=True, vaultzid=None):
+        """Records a finished job, failed jobs (ok=False) are rerun on resume"""
+        self._write({"id": self.job_id(username, password, vaultzid), "key": key, "value": value, "ok": ok})
+
+    def wrap(self, job):
+        """Wraps job(username, password) -> (key, value) so completed jobs are skipped and new ones recorded"""
+        def journaled(username, password):
+            job_id = self.job_id(username, password)
+            done = self.done.get(job_id)
+            if done is not None:
+                logging.debug(f"Journal: skipping completed job {username}")
+                return done
+            try:
+                key, value = job(username, password)
+            except Exception as e:
+                self._write({"id": job_id, "key": username, "value": {"error": str(e)}, "ok": False})
+                raise
+            self._write({"id": job_id, "key": key, "value": value, "ok": True})
+            return key, value
+        return journaled
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
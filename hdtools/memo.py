@@ -0,0 +1,115 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_MAXSIZE = 4096
+
+class RequestMemo:
+    """
+    Memoizes responses by URL for the life of a run.
+    Concurrent requests for the same URL are coalesced so only the first one goes out,
+    the rest wait on its result. Failed requests are not memoized.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._responses = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str, request):
+        """Returns the memoized response for url, calling request() at most once for concurrent callers"""
+        if not self.enabled:
+            return request()
+
+        with self._lock:
+            if url in self._responses:
+                self._responses.move_to_end(url)
+                self.hits += 1
+                logging.debug(f"MEMO hit {url}")
+                return self._responses[url]
+            future = self._inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self._inflight[url] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+                logging.debug(f"MEMO waiting on in-flight {url}")
+
+        if not owner:
+            return future.result()
+
+        try:
+            response = request()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[url]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[url]
+            self._responses[url] = response
+            while len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+        future.set_result(response)
+        return response
+
+    def invalidate(self, prefix: str):
+        """Drops memoized responses whose URL starts with prefix (ex. after a POST to the same module)"""
+        with self._lock:
+            for url in [url for url in self._responses if url.startswith(prefix)]:
+                del self._responses[url]
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+class ConditionalCache:
+    """
+    Keeps the last response of urls that sent an ETag/Last-Modified validator, so later GETs can be sent as
+    conditional requests. A 304 Not Modified answer is swapped for the stored response, nothing is downloaded again.
+    Unlike RequestMemo entries live across runs (ex. every poll of watch), only while enabled.
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.enabled = False
+        self.revalidated = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def headers(self, url: str):
+        """Conditional request headers for url (empty if there is nothing to revalidate)"""
+        with self._lock:
+            r = self._responses.get(url)
+        if r is None:
+            return {}
+        headers = {}
+        if r.headers.get("ETag"):
+            headers["If-None-Match"] = r.headers["ETag"]
+        if r.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = r.headers["Last-Modified"]
+        return headers
+
+    def update(self, url: str, response):
+        """Returns the response to use for url, the stored one on 304, storing new responses that have validators"""
+        with self._lock:
+            if response.status_code == 304 and url in self._responses:
+                self._responses.move_to_end(url)
+                self.revalidated += 1
+                logging.debug(f"Not modified {url}")
+                return self._responses[url]
+            if response.status_code == 200 and (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+                self._responses[url] = response
+                self._responses.move_to_end(url)
+                while len(self._responses) > self.maxsize:
+                    self._responses.popitem(last=False)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
@@ -0,0 +1,89 @@
+import logging
+import argparse
+
+from hdtools import config
+
+client = config.lazy_import('hdtools.client')
+
+SEARCH = 'Search'
+
+# field -> (payloads needed, extractor(payloads, user, username))
+# user is the input username, username the primary username resolved from HDTools
+FIELDS = {
+    'department': (('employeeRecords',), lambda p, user, username: client.extract_employee_field(p['employeeRecords'], 'departmentName')),
+    'supervisor': (('employeeRecords',), lambda p, user, username: client.extract_employee_field(p['employeeRecords'], 'supervisorName')),
+    'lockout': (('usernamesHDStudent',), lambda p, user, username: 'Locked' if client.extract_lockout_status(p['usernamesHDStudent']) else 'Unlocked'),
+    'lastpass': (('usernamesHDStudent',), lambda p, user, username: client.extract_password_change(p['usernamesHDStudent'], username)),
+    'abroad': (('courses',), lambda p, user, username: 'Abroad' if client.extract_abroad_status(p['courses']) else 'Local'),
+    'active': ((SEARCH,), lambda p, user, username: 'Active' if client.extract_user_status(p[SEARCH], user) else 'Inactive'),
+}
+
+def parse_fields(value: str):
+    """Parses a comma separated field list, used as an argparse type"""
+    fields = [field.strip().lower() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+def plan_modules(fields):
+    """Returns the payloads (in fetch order) needed to derive every requested field, including Search if needed"""
+    modules = []
+    for field in fields:
+        for module in FIELDS[field][0]:
+            if module not in modules:
+                modules.append(module)
+    return modules
+
+def plan_calls(fields, users):
+    """
+    Works out the HTTP calls a profile run will make without sending any request.
+    Returns a dict of search/module call counts, identities already in the identity cache need no search
+    unless a field is derived from the search data itself.
+    """
+    modules = plan_modules(fields)
+    fetch_modules = [module for module in modules if module != SEARCH]
+    users = list(dict.fromkeys(users))
+    searches = 0
+    for user in users:
+        if SEARCH in modules or client.identity_cache.get(client.identity_key(user)) is None:
+            searches += 1
+    return {
+        "users": len(users),
+        "modules": fetch_modules,
+        "search_calls": searches,
+        "module_calls": len(users) * len(fetch_modules),
+        "total_calls": searches + len(users) * len(fetch_modules),
+    }
+
+def fetch_profile(user: str, fields):
+    """Fetches each module needed by fields once and derives every field from those payloads"""
+    modules = plan_modules(fields)
+    payloads = {}
+    if SEARCH in modules:
+        payloads[SEARCH] = client.get_user_data(user)
+        vaultzid, username = client.extract_id_and_username(payloads[SEARCH])
+        client.identity_cache.put(client.identity_key(user), vaultzid, username)
+    else:
+        vaultzid, username = client.resolve_identity(user)
+
+    errors = {}
+    for module in modules:
+        if module != SEARCH:
+            try:
+                payloads[module] = client.get_module(module, vaultzid, projected=True)
+            except Exception as e:
+                errors[module] = e
+
+    profile = {}
+    for field in fields:
+        failed = [module for module in FIELDS[field][0] if module in errors]
+        if failed:
+            profile[field] = {"error": str(errors[failed[0]])}
+            continue
+        try:
+            profile[field] = FIELDS[field][1](payloads, user, username)
+        except Exception as e:
+            logging.debug(f"Failed to derive {field} for {username}: {e}")
+            profile[field] = {"error": str(e)}
+    return username, profile
@@ -0,0 +1,110 @@
+'''
+Decodes HDTools responses and projects them down to the fields hdcli actually uses, so batch runs don't keep
+(or memoize) whole module payloads per user.
+
+JSON is decoded with `orjson` when it is installed (`pip install orjson`, optional, noticeably faster on
+large payloads), otherwise with the standard library.
+
+A projection spec mirrors the shape of the payload:
+- a dict keeps only its keys, each projected with its own spec
+- a one element list projects every element of a list with that element's spec
+- a tuple keeps only those keys of a dict (their values whole)
+- a callable is applied to the value
+- True keeps the value as is
+Values that don't have the expected shape (ex. an {"ErrorMessage": ...} instead of a list) are kept as is,
+so callers still see HDTools' errors.
+'''
+
+import json
+import codecs
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Decodes JSON bytes/str, orjson if installed
+loads = orjson.loads if orjson is not None else json.loads
+
+def decode(response):
+    """Decodes a response body once, with the fastest available backend"""
+    return loads(response.content)
+
+class ArrayDecoder:
+    """Incrementally parses a top level JSON array fed as byte chunks, returning each element as soon as it is complete"""
+    def __init__(self):
+        self.done = False
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, chunk: bytes):
+        """Returns the elements completed by chunk"""
+        items = []
+        buffer = self._buffer + self._text.decode(chunk)
+        pos = 0
+        while not self.done:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not self._started:
+                if buffer[pos] != "[":
+                    raise ValueError("Response is not a JSON array")
+                self._started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                item, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element is incomplete, wait for more data
+                break
+            items.append(item)
+        self._buffer = buffer[pos:]
+        return items
+
+    def close(self):
+        if not self.done and self._buffer.strip():
+            raise ValueError("Truncated JSON array")
+
+def iter_json_array(chunks):
+    """Incrementally parses a top level JSON array from byte chunks, yielding each element as soon as it is complete"""
+    parser = ArrayDecoder()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+    parser.close()
+
+def project(data, spec):
+    """Returns only the parts of data selected by spec (see module docstring)"""
+    if spec is True:
+        return data
+    if callable(spec):
+        return spec(data)
+    if isinstance(spec, tuple):
+        if not isinstance(data, dict):
+            return data
+        return {key: data[key] for key in spec if key in data}
+    if isinstance(spec, list):
+        if not isinstance(data, list):
+            return data
+        return [project(item, spec[0]) for item in data]
+    if isinstance(spec, dict):
+        if not isinstance(data, dict):
+            return data
+        return {key: project(data[key], sub) for key, sub in spec.items() if key in data}
+    raise ValueError(f"Invalid projection spec: {spec!r}")
+
+# Fields the batch commands/extractors read from each payload, by module (Search = get_user_data)
+PROJECTIONS = {
+    'Search': [('zid', 'primaryUserName', 'userNames', 'userNamesHealth')],
+    'usernamesHDStudent': {'items': [{'data': ('label', 'activeDirectoryLockout', 'passwordChangedTime')}]},
+    'employeeRecords': {'items': [{'data': ('objectId', 'status', 'departmentName', 'supervisorName')}]},
+    # Only the course codes matter (abroad), not their titles
+    'courses': {'items': [{'data': lambda courses: dict.fromkeys(courses) if isinstance(courses, dict) else courses}]},
+}
@@ -0,0 +1,99 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUSES = {429, 502, 503, 504}
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+def backoff_delay(attempt: int, base=BASE_BACKOFF, cap=MAX_BACKOFF):
+    """Exponential backoff with full jitter for the given (0 based) retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (seconds or HTTP date) into seconds, None if missing/invalid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Token bucket rate limiter, rate is requests per second (None or 0 = unlimited)"""
+    def __init__(self, rate=None, burst=None):
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate=None, burst=None):
+        with self._lock:
+            self.rate = rate or None
+            self.burst = burst or max(1.0, rate or 1.0)
+            self._tokens = self.burst
+            self._updated = time.monotonic()
+
+    def acquire(self):
+        """Blocks until a token is available"""
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveLimiter:
+    """
+    Limits concurrent requests with AIMD (additive increase, multiplicative decrease).
+    Each successful request grows the limit by 1/limit (about +1 per round of requests), a throttled/failed
+    request or one much slower than the baseline latency halves it (at most once per cooldown).
+    """
+    def __init__(self, limit=4, minimum=1, maximum=4, tolerance=3.0, cooldown=1.0):
+        self.minimum = minimum
+        self.tolerance = tolerance
+        self.cooldown = cooldown
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._baseline = None
+        self._decreased = 0.0
+        self.configure(limit, maximum)
+
+    def configure(self, limit, maximum=None):
+        with self._cond:
+            self.maximum = max(self.minimum, maximum or limit)
+            self.limit = float(min(max(limit, self.minimum), self.maximum))
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            while self._inflight >= int(self.limit):
+                self._cond.wait()
+            self._inflight += 1
+
+    def release(self, latency: float, ok=True):
+        """Releases a slot, feeding back the request latency and whether it succeeded"""
+        with self._cond:
+            self._inflight -= 1
+            if ok:
+                self._baseline = latency if self._baseline is None else min(latency, 0.9 * self._baseline + 0.1 * latency)
+            slow = self._baseline is not None and latency > self.tolerance * self._baseline
+            now = time.monotonic()
+            if not ok or slow:
+                if now - self._decreased >= self.cooldown:
+                    self._decreased = now
+                    self.limit = max(self.minimum, self.limit / 2)
+                    logging.debug(f"AIMD decrease to {int(self.limit)} (ok={ok}, latency={latency:.3f}s)")
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
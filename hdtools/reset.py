@@ -0,0 +1,78 @@
+import re
+import logging
+
+from hdtools import config, batch
+from hdtools.dedup import AliasIndex
+
+client = config.lazy_import('hdtools.client')
+
+def reset_user(vaultzid: str, username: str):
+    """Resets a resolved user's password and sets the reset description, returns (username, result)"""
+    reset_result = client.reset_password(username, vaultzid)
+    result = {"SuccessMessage": reset_result.get("SuccessMessage")}
+    if not result["SuccessMessage"]:
+        result["error"] = "Password reset failed. No SuccessMessage returned."
+        return username, result
+    # The reset already happened, a failed description must not make the job look unfinished (and get reset again)
+    try:
+        result["description"] = client.set_user_description(username, vaultzid).get("description")
+    except Exception as e:
+        result["error"] = f"Password was reset but setting the description failed: {e}"
+    return username, result
+
+def redact(result):
+    """A reset result without the temporary password, for journals the user didn't ask to keep them in"""
+    if not isinstance(result, dict) or not result.get("SuccessMessage"):
+        return result
+    return {**result, "SuccessMessage": re.sub(r"<b>.*?</b>", "<b>(not journaled)</b>", result["SuccessMessage"])}
+
+def reset_failed(result) -> bool:
+    return not isinstance(result, dict) or not result.get("SuccessMessage")
+
+def iter_bulk_reset(credentials, workers=batch.DEFAULT_WORKERS, lookup_workers=None, journal=None, journal_passwords=True,
+                    on_alias=None):
+    """
+    Pipelined bulk reset, yields (username, result) in input order.
+    Identity lookups run ahead in their own pool (lookup_workers, default 2 * workers) while the reset and
+    description POSTs run with at most workers users in flight. Each user is reset at most once per run: later
+    aliases of a vaultzid are dropped from the results (on_alias(username) is called for each). With a journal,
+    every outcome is recorded by vaultzid as it completes so a resumed run skips users that were already reset,
+    under any alias. Without journal_passwords the journal
+    only records the outcome, not the temporary password.
+    """
+    lookup_workers = lookup_workers or 2 * workers
+    aliases = AliasIndex(resolve=True, on_alias=on_alias)
+
+    def lookup(username, password):
+        vaultzid, primary = client.resolve_identity(username)
+        # Keyed by vaultzid, so a completed user is skipped however the resumed input spells them
+        done = journal.lookup(username, vaultzid=vaultzid) if journal else None
+        if done is not None:
+            logging.debug(f"Journal: skipping completed reset {username}")
+            return username, ("done", done)
+        return username, ("identity", (vaultzid, primary))
+
+    def reset(username, looked_up):
+        if isinstance(looked_up, dict):
+            # Lookup failed, nothing was reset
+            if journal:
+                journal.record(username, None, username, looked_up, ok=False)
+            return username, looked_up
+        kind, value = looked_up
+        if kind == "done":
+            return value
+        vaultzid, primary = value
+        try:
+            key, result = reset_user(vaultzid, primary)
+        except Exception as e:
+            if journal:
+                journal.record(username, None, username, {"error": str(e)}, ok=False, vaultzid=vaultzid)
+            raise
+        if journal:
+            journal.record(username, None, key, result if journal_passwords else redact(result), vaultzid=vaultzid)
+        return key, result
+
+    # Any password column is irrelevant to a reset, fold on the identity alone
+    usernames = ((username, None) for username, _ in credentials)
+    identities = aliases.filter(batch.iter_batch(aliases.wrap(lookup), usernames, lookup_workers))
+    return batch.iter_batch(reset, identities, workers)
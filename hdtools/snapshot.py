@@ -0,0 +1,69 @@
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+def url_key(url: str):
+    """Snapshot key for a url, path and query only (so snapshots work under any HDTools base url) and case-insensitive"""
+    parts = urlsplit(url)
+    return (parts.path + (f"?{parts.query}" if parts.query else "")).lower()
+
+class Snapshot:
+    """
+    Local SQLite store of HDTools GET responses (zlib compressed) keyed by url, with the time each was fetched.
+    Written by the snapshot command, read by --offline to answer requests without HDTools.
+    """
+    def __init__(self, path: str, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._pending = 0
+        if readonly:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, status INTEGER, body BLOB, fetched REAL) WITHOUT ROWID")
+            self._db.commit()
+        logging.debug(f"Opened snapshot {path} ({'read only' if readonly else 'writing'})")
+
+    def put(self, url: str, response: requests.Response):
+        """Stores a response, committed in batches (and on close)"""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                             (url_key(url), response.status_code, zlib.compress(response.content), time.time()))
+            self._pending += 1
+            if self._pending >= 500:
+                self._db.commit()
+                self._pending = 0
+
+    def get(self, url: str):
+        """Returns the stored response for url as a requests.Response, or None if it isn't in the snapshot"""
+        with self._lock:
+            row = self._db.execute("SELECT status, body, fetched FROM responses WHERE key = ?", (url_key(url),)).fetchone()
+        if row is None:
+            return None
+        status, body, fetched = row
+        r = requests.Response()
+        r.status_code = status
+        r._content = zlib.decompress(body)
+        r._content_consumed = True
+        r.url = url
+        r.encoding = "utf-8"
+        r.headers["Content-Type"] = "application/json"
+        r.headers["X-Snapshot-Fetched"] = str(fetched)
+        return r
+
+    def info(self):
+        """Returns (responses stored, oldest fetch time, newest fetch time)"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*), MIN(fetched), MAX(fetched) FROM responses").fetchone()
+
+    def close(self):
+        with self._lock:
+            if not self.readonly:
+                self._db.commit()
+            self._db.close()
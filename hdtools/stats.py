@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import time
+import threading
+from bisect import bisect_left
+from urllib.parse import urlparse
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is +Inf
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def endpoint_name(url: str):
+    """Collapses a request url into an endpoint name without ids (ex. rest/employeeRecords, checkAuth)"""
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/")
+    match = re.match(r"^/srv/feed/dynamic/(rest|checkAuth)/([^/]+)", path)
+    if match:
+        if match.group(1) == "checkAuth":
+            return "checkAuth"
+        return f"rest/{match.group(2)}"
+    if path.endswith("getModules.php"):
+        return "getModules"
+    if "/idp/" in path:
+        return "idp"
+    return f"{parsed.hostname}{path or '/'}"
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.statuses = {}
+
+    def percentile(self, pct):
+        """Estimates a latency percentile from the histogram (upper bound of the bucket it falls in)"""
+        target = pct / 100 * self.requests
+        seen = 0
+        for n, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return BUCKETS[n] if n < len(BUCKETS) else float("inf")
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 4),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.buckets)),
+            "statuses": self.statuses,
+        }
+
+class RequestStats:
+    """Thread safe per-endpoint request telemetry (counts, latency histogram, bytes, retries, cache hits)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.endpoints = {}
+
+    def _endpoint(self, url):
+        name = endpoint_name(url)
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointStats()
+        return self.endpoints[name]
+
+    def record(self, url: str, seconds: float, nbytes=0, status=None):
+        """Records a completed request (status None = no response, ex. connection error)"""
+        with self._lock:
+            stats = self._endpoint(url)
+            stats.requests += 1
+            stats.seconds += seconds
+            stats.bytes += nbytes
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            if status is None or status >= 400:
+                stats.errors += 1
+
+    def record_retry(self, url: str):
+        with self._lock:
+            self._endpoint(url).retries += 1
+
+    def record_cache_hit(self, url: str):
+        """Records a request that was avoided thanks to a cache/memo"""
+        with self._lock:
+            self._endpoint(url).cache_hits += 1
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in sorted(self.endpoints.items())}
+        return {
+            "started": self.started,
+            "duration": round(time.time() - self.started, 3),
+            "requests": sum(e["requests"] for e in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+    def format_summary(self) -> str:
+        data = self.to_dict()
+        lines = [f"{'endpoint':<28} {'reqs':>7} {'errs':>5} {'retry':>5} {'cached':>6} {'avg ms':>8} {'p95 ms':>8} {'KiB':>9}"]
+        for name, e in data["endpoints"].items():
+            avg = e["seconds"] / e["requests"] * 1000 if e["requests"] else 0.0
+            lines.append(f"{name:<28} {e['requests']:>7} {e['errors']:>5} {e['retries']:>5} {e['cache_hits']:>6} "
+                         f"{avg:>8.1f} {e['p95'] * 1000:>8.0f} {e['bytes'] / 1024:>9.1f}")
+        lines.append(f"Total: {data['requests']} requests in {data['duration']}s")
+        return "\n".join(lines)
+
+    def to_prometheus(self, labels=None) -> str:
+        """Renders the stats in the Prometheus text exposition format (for node_exporter's textfile collector)"""
+        data = self.to_dict()
+        extra = "".join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        endpoints = data["endpoints"]
+        for field, name, help_text in [
+            ("requests", "hdcli_requests_total", "HTTP requests sent"),
+            ("errors", "hdcli_request_errors_total", "HTTP requests that failed or returned >= 400"),
+            ("retries", "hdcli_request_retries_total", "HTTP requests retried"),
+            ("cache_hits", "hdcli_cache_hits_total", "HTTP requests avoided by caches"),
+            ("bytes", "hdcli_response_bytes_total", "Response body bytes received"),
+        ]:
+            metric(name, "counter", help_text,
+                   [f'{name}{{endpoint="{endpoint}"{extra}}} {e[field]}' for endpoint, e in endpoints.items()])
+
+        samples = []
+        for endpoint, e in endpoints.items():
+            cumulative = 0
+            for le, count in e["buckets"].items():
+                cumulative += count
+                samples.append(f'hdcli_request_duration_seconds_bucket{{endpoint="{endpoint}"{extra},le="{le}"}} {cumulative}')
+            samples.append(f'hdcli_request_duration_seconds_sum{{endpoint="{endpoint}"{extra}}} {e["seconds"]}')
+            samples.append(f'hdcli_request_duration_seconds_count{{endpoint="{endpoint}"{extra}}} {e["requests"]}')
+        metric("hdcli_request_duration_seconds", "histogram", "HTTP request latency", samples)
+
+        label_str = extra.lstrip(",")
+        metric("hdcli_run_duration_seconds", "gauge", "Duration of the last run", [f"hdcli_run_duration_seconds{{{label_str}}} {data['duration']}"])
+        metric("hdcli_last_run_timestamp_seconds", "gauge", "Start time of the last run", [f"hdcli_last_run_timestamp_seconds{{{label_str}}} {data['started']}"])
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_prometheus(self, path: str, labels=None):
+        """Writes atomically so the textfile collector never reads a partial file"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus(labels))
+        os.replace(tmp, path)